@@ -1,21 +1,37 @@
-from flask import Flask, render_template, request, jsonify, send_file, session
-from flask_session import Session
-import pandas as pd
-import redis
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 import os
-import numpy as np
-import xml.etree.ElementTree as ET
-from io import StringIO, BytesIO
-import chardet
-import re
-import zipfile
+import json
+import itertools
+import atexit
+import logging
+import uuid
 from database_manager import DatabaseConnectionManager
+from dataset_store import DatasetStore, DatasetConflict, DEFAULT_PAGE_SIZE, read_window
+import transforms
+import reshape
+from pipeline import run_pipeline, RecipeStore
+from history import rename_operation, column_operation, checkpoint_operation
+from serialization import (
+    negotiate_format, frame_to_records, frame_to_columnar, frame_to_arrow,
+    COLUMNAR_MIMETYPE, ARROW_MIMETYPE
+)
+from ingest import spooled_upload, spool_to_tempfile, upload_extension, read_upload_file
+from jobs import JobManager
+import workers
+from cleaning import clean_frame, parse_rules
+from upload_cache import UploadCache, new_upload_hasher
+from export import EXPORT_FORMATS, export_stream
+from profiling import dataset_profile
+from instrumentation import instrument_app, stage, count_rows, metrics, profiles
 
 
 
 app = Flask(__name__, template_folder="templates")
 app.secret_key = os.urandom(24)
 
+# Tempo por etapa, linhas, bytes e memória de cada requisição, expostos em /metrics
+instrument_app(app)
+
 # app.config['SESSION_TYPE'] = 'redis'
 # app.config['SESSION_PERMANENT'] = False
 # app.config['SESSION_USE_SIGNER'] = True  # Para assinar cookies
@@ -23,69 +39,78 @@ app.secret_key = os.urandom(24)
 
 # Session(app)
 
-# Instância global do gerenciador de banco de dados
+# Instância global do gerenciador de banco de dados (engines e pools compartilhados)
 db_manager = DatabaseConnectionManager()
-
-# @app.route('/check_session', methods=['GET'])
-# def check_session():
-#     # Obtém o histórico diretamente da sessão
-#     history = session.get('history', [])
-    
-#     # Verifique se o histórico foi inicializado
-#     if history:
-#         print("Histórico encontrado:", history)
-#     else:
-#         print("Nenhum histórico encontrado na sessão.")
-    
-#     # Retorna o histórico como JSON
-#     return jsonify(history)
-
-
-# @app.before_request
-# def ensure_history_initialized():
-#     print("Verificando a inicialização do histórico...")
-#     if 'history' not in session:
-#         print("Inicializando histórico na sessão.")
-#         session['history'] = []  # Inicializa o histórico
-#     else:
-#         print(f"Histórico existente na sessão: {session['history']}")
-
-# def initialize_history():
-#     if 'history' not in session:
-#         print("Iniciando sessão de histórico")
-#         session['history'] = []
-#     else:
-#         print("Sessão de histórico ja iniciada")
-
-# def save_state(df, operation):
-#     # Verifique se o 'history' existe na sessão
-#     if 'history' not in session:
-#         print("Inicializando 'history' na sessão...")
-#         session['history'] = []  # Iniciar o histórico, se não existir
-#     print(f'Salvando operação no histórico: {operation}')
-#     # Salvar o estado
-#     session['history'].append({
-#         'data': df.to_dict(orient='records'),
-#         'operation': operation
-#     })
-#     session.modified = True  # Garante que a sessão seja marcada como modificada
-
-# @app.route('/get_history', methods=['GET'])
-# def get_history():
-#     return jsonify(session.get('history', []))
-
-# @app.route('/undo', methods=['POST'])
-# def undo():
-#     history = session.get('history', [])
-#     if len(history) > 1:
-#         history.pop()  # Remove a última operação
-#         session['history'] = history
-#         last_state = history[-1]['data']  # Obtém o estado anterior
-#         global df
-#         df = pd.DataFrame(last_state)  # Restaura o DataFrame
-#         return jsonify(last_state)
-#     return jsonify({"error": "Nenhuma operação para desfazer"}), 400
-    
+atexit.register(db_manager.dispose)
+
+# Armazenamento dos DataFrames carregados, por sessão (LRU + limite de memória)
+dataset_store = DatasetStore(
+    max_bytes=int(os.getenv('GMASTER_DATASET_MEMORY_MB', '2048')) * 1024 ** 2,
+    max_datasets=int(os.getenv('GMASTER_MAX_DATASETS', '32')),
+    history_max_bytes=int(os.getenv('GMASTER_HISTORY_MEMORY_MB', '256')) * 1024 ** 2,
+    compact_dtypes=os.getenv('GMASTER_COMPACT_DTYPES', '1') != '0'
+)
+
+# Cargas longas (uploads e tabelas do banco) executadas em segundo plano
+job_manager = JobManager(dataset_store)
+atexit.register(job_manager.shutdown)
+atexit.register(workers.shutdown)
+
+# Uploads já lidos, reaproveitados pelo hash do conteúdo
+upload_cache = UploadCache(
+    os.getenv('GMASTER_UPLOAD_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_cache')),
+    max_bytes=int(os.getenv('GMASTER_UPLOAD_CACHE_MB', '4096')) * 1024 ** 2
+)
+
+# Pipelines salvos para reaplicar em novos uploads
+recipe_store = RecipeStore(os.getenv('GMASTER_RECIPES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recipes')))
+
+
+def session_owner():
+    """Retorna o identificador da sessão atual, criando-o se necessário."""
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+def get_request_dataset(data):
+    """Obtém o dataset indicado por `dataset_id` na requisição."""
+    dataset_id = (data or {}).get('dataset_id')
+    if not dataset_id:
+        raise ValueError("ID do dataset não fornecido.")
+    try:
+        return dataset_store.get(dataset_id, session_owner())
+    except KeyError:
+        raise LookupError(f"Dataset '{dataset_id}' não encontrado ou expirado. Carregue os dados novamente.")
+
+
+def page_response(dataset, page, extra=None):
+    """
+    Responde com os metadados do dataset e uma página de linhas, no formato
+    negociado com o cliente: registros JSON, JSON colunar ou Arrow IPC.
+    """
+    info = dataset.info()
+    info.update(extra or {})
+    response_format = negotiate_format(request)
+    count_rows('serialize', len(page))
+    with stage('serialize'):
+        if response_format == 'arrow':
+            response = Response(frame_to_arrow(page, info), mimetype=ARROW_MIMETYPE)
+            response.headers['X-Dataset-Info'] = json.dumps(info, default=str, ensure_ascii=True)
+            return response
+        if response_format == 'columnar':
+            return Response(frame_to_columnar(page, info), mimetype=COLUMNAR_MIMETYPE)
+        info["data"] = frame_to_records(page)
+        return jsonify(info)
+
+
+def dataset_response(dataset, message=None, extra=None):
+    """Monta a resposta padrão com o ID do dataset e a primeira página de registros."""
+    page, _ = read_window(dataset, 0, DEFAULT_PAGE_SIZE)
+    extra = {"offset": 0, "limit": DEFAULT_PAGE_SIZE, **(extra or {})}
+    if message:
+        extra["message"] = message
+    return page_response(dataset, page, extra)
 
 @app.route('/database', methods=['POST'])
 def handle_database_request():
@@ -95,14 +120,16 @@ def handle_database_request():
             return jsonify({"error": "Dados não fornecidos na requisição."}), 400
         
         action = data.get("action")
-        if action not in ["set_database", "load_table"]:
-            return jsonify({"error": "Ação inválida. Use 'set_database' ou 'load_table'."}), 400
+        if action not in ["set_database", "load_table", "query", "write_table", "pool_stats"]:
+            return jsonify({"error": "Ação inválida. Use 'set_database', 'load_table', 'query', 'write_table' ou 'pool_stats'."}), 400
         
         if action == "set_database":
             db_type = data.get("db_type")
             if not db_type:
                 return jsonify({"error": "Tipo de banco de dados não especificado."}), 400
             db_manager.configure_connection(db_type)
+            # Cada sessão usa a engine do seu próprio banco, sem depender do último configurado
+            session['db_type'] = db_type
             return jsonify({
                 "message": f"Conexão configurada com sucesso para {db_type}",
                 "db_type": db_type
@@ -112,317 +139,553 @@ def handle_database_request():
             table_name = data.get("table_name")
             if not table_name:
                 return jsonify({"error": "Nome da tabela não fornecido."}), 400
-            data = db_manager.load_table_data(table_name)
-            return jsonify({
-                "message": f"Dados carregados com sucesso da tabela '{table_name}'",
-                "data": data,
-                "row_count": len(data)
-            })
+            columns = data.get("columns") or None
+            limit = data.get("limit")
+            db_type = session.get('db_type')
+            if data.get("stream"):
+                # Envia a tabela em NDJSON, bloco a bloco, sem montar o DataFrame inteiro.
+                # O primeiro bloco é lido antes para que erros (tabela inexistente) virem 400.
+                stream = db_manager.stream_table_ndjson(table_name, columns, limit, db_type=db_type)
+                first_chunk = next(stream, "")
+                return Response(
+                    stream_with_context(itertools.chain([first_chunk], stream)),
+                    mimetype='application/x-ndjson'
+                )
+            with stage('build'):
+                df = db_manager.load_table_frame(table_name, columns, limit, db_type=db_type)
+            count_rows('build', len(df))
+            dataset = dataset_store.add(session_owner(), df, name=table_name)
+            return dataset_response(dataset, f"Dados carregados com sucesso da tabela '{table_name}'")
+
+        elif action == "query":
+            # Filtros, colunas, ordenação, limite e agregações executados pelo próprio banco
+            table_name = data.get("table_name")
+            if not table_name:
+                return jsonify({"error": "Nome da tabela não fornecido."}), 400
+            query = data.get("query") or {}
+            if not isinstance(query, dict):
+                return jsonify({"error": "A consulta deve ser um objeto JSON."}), 400
+            with stage('build'):
+                df = db_manager.query_frame(table_name, query, db_type=session.get('db_type'))
+            count_rows('build', len(df))
+            dataset = dataset_store.add(session_owner(), df, name=table_name)
+            return dataset_response(dataset, f"Consulta executada com sucesso na tabela '{table_name}'")
+
+        elif action == "write_table":
+            # Grava o dataset do servidor de volta no banco (ETL completo)
+            table_name = data.get("table_name")
+            if not table_name:
+                return jsonify({"error": "Nome da tabela não fornecido."}), 400
+            try:
+                dataset = get_request_dataset(data)
+            except LookupError as e:
+                return jsonify({"error": str(e)}), 404
+            report = db_manager.write_table(table_name, dataset.df, data.get("if_exists", "append"),
+                                            db_type=session.get('db_type'))
+            report["message"] = f"{report['rows']} linhas gravadas na tabela '{table_name}'."
+            return jsonify(report)
+
+        elif action == "pool_stats":
+            return jsonify(db_manager.pool_stats())
     
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Erro inesperado: {str(e)}"}), 500
 
+@app.route('/datasets/<dataset_id>/rows', methods=['GET'])
+def dataset_rows(dataset_id):
+    """Retorna uma janela de linhas (offset/limit), com ordenação e filtro opcionais."""
+    try:
+        dataset = dataset_store.get(dataset_id, session_owner())
+    except KeyError:
+        return jsonify({"error": f"Dataset '{dataset_id}' não encontrado ou expirado."}), 404
+
+    try:
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        sort = request.args.get('sort') or None
+        ascending = request.args.get('order', 'asc').lower() != 'desc'
+        search = request.args.get('search') or None
+        filters = json.loads(request.args.get('filters', '{}'))
+        if not isinstance(filters, dict):
+            return jsonify({"error": "O parâmetro 'filters' deve ser um objeto JSON."}), 400
+
+        with stage('compute'):
+            page, filtered_count = read_window(dataset, offset, limit, sort, ascending, search, filters)
+        return page_response(dataset, page, {
+            "offset": offset,
+            "limit": limit,
+            "filtered_count": filtered_count
+        })
+    except (ValueError, json.JSONDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/datasets/<dataset_id>/export', methods=['GET'])
+def export_dataset(dataset_id):
+    """Envia o dataset como arquivo (CSV, Parquet ou XLSX), gerado em blocos durante a resposta."""
+    try:
+        dataset = dataset_store.get(dataset_id, session_owner())
+    except KeyError:
+        return jsonify({"error": f"Dataset '{dataset_id}' não encontrado ou expirado."}), 404
+
+    export_format = request.args.get('format', 'csv')
+    try:
+        stream = export_stream(dataset.df, export_format)
+        # O primeiro bloco é gerado antes da resposta para que erros virem 400
+        with stage('serialize'):
+            first_chunk = next(stream, b"")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    count_rows('serialize', len(dataset.df))
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = os.path.splitext(dataset.name or 'dados')[0] + extension
+    return Response(
+        stream_with_context(itertools.chain([first_chunk], stream)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/datasets/<dataset_id>/profile', methods=['GET'])
+def profile_dataset(dataset_id):
+    """
+    Perfil das colunas (tipo, nulos, distintos estimados, faixa, média, quantis e
+    valores mais frequentes), calculado no servidor sem enviar a tabela ao navegador.
+    """
+    try:
+        dataset = dataset_store.get(dataset_id, session_owner())
+    except KeyError:
+        return jsonify({"error": f"Dataset '{dataset_id}' não encontrado ou expirado."}), 404
+
+    columns = request.args.get('columns')
+    columns = [col.strip() for col in columns.split(',') if col.strip()] if columns else None
+    try:
+        with stage('compute'):
+            profiles, computed = dataset_profile(dataset, columns, request.args.get('top', 10, type=int))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "dataset_id": dataset.id,
+        "version": dataset.version,
+        "row_count": len(dataset.df),
+        "columns": profiles,
+        "computed_columns": [str(col) for col in computed],
+    })
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global df
     if 'file' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
     file = request.files['file']
 
-    try:
-        # Verifica se é um arquivo .zip
-        if file.filename.endswith('.zip'):
-            print("Tentando processar um arquivo ZIP...")
-            with zipfile.ZipFile(BytesIO(file.read()), 'r') as zip_ref:
-                zip_ref.extractall('extracted_files')
-                print("Arquivos extraídos com sucesso.")
-
-            # Processar arquivos dentro do .zip
-            extracted_files = os.listdir('extracted_files')
-            data = []
-            for extracted_file in extracted_files:
-                file_path = os.path.join('extracted_files', extracted_file)
-                if extracted_file.endswith('.xlsx'):
-                    print(f"Tentando ler o arquivo XLSX dentro do ZIP: {extracted_file}...")
-                    df = pd.read_excel(file_path)
-                    for col in df.select_dtypes(include=['datetime']):
-                        df[col] = df[col].astype(str)
-                    data.extend(df.to_dict(orient='records'))
-                    print(f"Arquivo XLSX {extracted_file} lido com sucesso.")
-
-                elif extracted_file.endswith('.json'):
-                    print(f"Tentando ler o arquivo JSON dentro do ZIP: {extracted_file}...")
-                    try:
-                        with open(file_path, 'r') as f:
-                            file_data = json.load(f)
-                            if isinstance(file_data, list) and all(isinstance(item, dict) for item in file_data):
-                                data.extend(file_data)
-                                print(f"Arquivo JSON {extracted_file} lido com sucesso.")
-                            else:
-                                print(f"Estrutura de JSON inesperada no arquivo {extracted_file}. Esperado: lista de dicionários.")
-                                return jsonify({"error": f"Formato de JSON inválido no arquivo {extracted_file}. Esperado uma lista de objetos."}), 400
-                    except json.JSONDecodeError as e:
-                        print(f"Erro de decodificação JSON no arquivo {extracted_file}: {e}")
-                        return jsonify({"error": f"Erro ao decodificar o arquivo JSON {extracted_file}."}), 400
-
-                elif extracted_file.endswith('.xml'):
-                    print(f"Tentando ler o arquivo XML dentro do ZIP: {extracted_file}...")
-                    import xml.etree.ElementTree as ET
-                    tree = ET.parse(file_path)
-                    root = tree.getroot()
-                    xml_data = [{child.tag: child.text for child in elem} for elem in root]
-                    data.extend(xml_data)
-                    print(f"Arquivo XML {extracted_file} lido com sucesso.")
-
-                elif extracted_file.endswith('.csv'):
-                    print(f"Tentando ler o arquivo CSV dentro do ZIP: {extracted_file}...")
-                    with open(file_path, 'rb') as f:
-                        raw_data = f.read()
-                        result = chardet.detect(raw_data)
-                        encoding = result['encoding']
-                        print(f'Codificação detectada para {extracted_file}: {encoding}')
-
-                        content = raw_data.decode(encoding, errors='replace')
-                        df = pd.read_csv(StringIO(content), sep=None, on_bad_lines='skip', quotechar='"', skipinitialspace=True)
-                        print(df.head())
-                        df = df.where(pd.notnull(df), 'N/A')
-                        data.extend(df.to_dict(orient='records'))
-                        print(f"Arquivo CSV {extracted_file} lido com sucesso.")
-
-                else:
-                    print(f"Tipo de arquivo {extracted_file} não suportado dentro do ZIP.")
-                    return jsonify({"error": f"Tipo de arquivo {extracted_file} não suportado dentro do ZIP."}), 400
-
-            # Limpa a pasta temporária de extração
-            for extracted_file in extracted_files:
-                os.remove(os.path.join('extracted_files', extracted_file))
-            os.rmdir('extracted_files')
-
-        elif file.filename.endswith('.xlsx'):
-            print("Tentando ler o arquivo XLSX...")
-            df = pd.read_excel(BytesIO(file.read()))
-            for col in df.select_dtypes(include=['datetime']):
-                df[col] = df[col].astype(str)
-            data = df.to_dict(orient='records')
-            print("Arquivo XLSX lido com sucesso.")
-
-        elif file.filename.endswith('.json'):
-            print("Tentando ler o arquivo JSON...")
-            try:
-                data = json.load(file)
-                if isinstance(data, list) and all(isinstance(item, dict) for item in data):
-                    print("Arquivo JSON lido com sucesso.")
-                    df = pd.DataFrame(data)
-                else:
-                    print("Estrutura de JSON inesperada. Esperado: lista de dicionários.")
-                    return jsonify({"error": "Formato de JSON inválido. Esperado uma lista de objetos."}), 400
-            except json.JSONDecodeError as e:
-                print(f"Erro de decodificação JSON: {e}")
-                return jsonify({"error": "Erro ao decodificar o arquivo JSON."}), 400
-
-        elif file.filename.endswith('.xml'):
-            print("Tentando ler o arquivo XML...")
-            try:
-                # Lê o XML diretamente como DataFrame
-                df = pd.read_xml(BytesIO(file.read()))
-
-                # Exibe as primeiras linhas
-                print("Primeiras linhas do DataFrame:")
-                print(df.head())
-                
-                # Preenche valores nulos e converte para dicionário
-                data = df.fillna("null").to_dict(orient='records')
-                print("Arquivo XML lido com sucesso.")
-            except ValueError as e:
-                print(f"Erro ao processar o arquivo XML com Pandas: {e}")
-                data = []
-
-        elif file.filename.endswith('.csv'):
-            print("Tentando ler o arquivo CSV...")
-            raw_data = file.read()
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-            print(f'Codificação detectada: {encoding}')
-
-            content = raw_data.decode(encoding, errors='replace')
-            df = pd.read_csv(StringIO(content), sep=None, on_bad_lines='skip', quotechar='"', skipinitialspace=True)
-            
-            print(df.head())
-            # initialize_history()
-            # save_state(df, "Arquivo carregado")
-
-            data = df.fillna("null").to_dict(orient='records')
-            print("Arquivo CSV lido com sucesso.")
-            
-        elif file.filename.endswith('.txt'):
-            try:
-                print("Tentando ler o arquivo TXT...")
-                # Lê o arquivo como um DataFrame, ignorando a coluna inicial e final (delimitadores vazios)
-                df = pd.read_csv(BytesIO(file.read()), sep='|', header=None, engine='python')
-                
-                # Remove as colunas vazias (delimitadores extras no início e fim)
-                df = df.iloc[:, 1:-1]
-
-                # Exibe as primeiras linhas para depuração
-                print("Primeiras linhas do DataFrame:")
-                print(df.head())
-                data = df.fillna("null").to_dict(orient='records')
-                print("Arquivo XML lido com sucesso.")
-                
-                
-            except Exception as e:
-                print(f"Erro ao processar o arquivo TXT: {e}")
-                return None
+    extension = upload_extension(file.filename)
+    if extension is None:
+        app.logger.warning("Tipo de arquivo não suportado: %s", file.filename)
+        return jsonify({"error": "File type not supported"}), 400
 
-        else:
-            print("Tipo de arquivo não suportado.")
-            return jsonify({"error": "File type not supported"}), 400
-        
-        return jsonify(data)
+    try:
+        # Grava o upload em disco e lê a partir do arquivo, sem manter cópias na memória
+        sheets = upload_sheets(request.form)
+        hasher = new_upload_hasher(extension, sheets)
+        with spooled_upload(file, extension, hasher) as path:
+            digest = hasher.hexdigest()
+            df = upload_cache.get(digest)
+            if df is None:
+                with stage('build'):
+                    df = read_upload_file(path, file.filename, sheets=sheets)
+                upload_cache.put(digest, df)
+        count_rows('build', len(df))
+
+        dataset = dataset_store.add(session_owner(), df, name=file.filename)
+        return dataset_response(dataset)
 
+    except ValueError as e:
+        app.logger.warning("Erro ao processar o arquivo: %s", e)
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"Erro ao processar o arquivo: {e}")
+        app.logger.exception("Erro ao processar o arquivo")
         return jsonify({"error": f"Failed to process the file: {str(e)}"}), 500
     
+def upload_sheets(form):
+    """Planilhas do XLSX pedidas no formulário: '*' (todas) ou nomes separados por vírgula."""
+    sheets = (form.get('sheets') or '').strip()
+    if not sheets or sheets == '*':
+        return sheets or None
+    return [name.strip() for name in sheets.split(',') if name.strip()]
+
+def upload_job(job, path, filename, digest, sheets=None):
+    """Lê o upload em segundo plano. CSV/TXT são lidos em blocos, informando o progresso."""
+    df = upload_cache.get(digest)
+    if df is not None:
+        job.report(len(df))
+        return df
+    # ZIP e planilhas de um XLSX já são lidos em paralelo pelo pool de processos do ingest
+    with stage('build'):
+        if upload_extension(filename) in ('.csv', '.txt', '.xml', '.zip') or sheets:
+            df = read_upload_file(path, filename, on_chunk=job.report, sheets=sheets)
+        else:
+            df = job_manager.run_in_process(job, read_upload_file, path, filename)
+    count_rows('build', len(df))
+    upload_cache.put(digest, df)
+    return df
+
+
+def database_job(job, action, table_name, columns, limit, query, db_type):
+    """Carrega a tabela ou o resultado da consulta em segundo plano, bloco a bloco."""
+    with stage('build'):
+        if action == 'query':
+            df = db_manager.query_frame(table_name, query, db_type=db_type, on_chunk=job.report)
+        else:
+            df = db_manager.load_table_frame(table_name, columns, limit, db_type=db_type, on_chunk=job.report)
+    count_rows('build', len(df))
+    return df
+
+
+@app.route('/upload/cache', methods=['GET'])
+def upload_cache_stats():
+    return jsonify(upload_cache.stats())
+
+@app.route('/jobs/upload', methods=['POST'])
+def submit_upload_job():
+    """Recebe o arquivo e retorna imediatamente o ID do job que fará a leitura."""
+    if 'file' not in request.files:
+        return jsonify({"error": "No file uploaded"}), 400
+    file = request.files['file']
+    extension = upload_extension(file.filename)
+    if extension is None:
+        return jsonify({"error": "File type not supported"}), 400
+
+    # O arquivo precisa ser gravado durante a requisição; o job o remove ao terminar
+    sheets = upload_sheets(request.form)
+    hasher = new_upload_hasher(extension, sheets)
+    path = spool_to_tempfile(file, extension, hasher)
+    job = job_manager.submit(session_owner(), 'upload', file.filename, upload_job, path, file.filename, hasher.hexdigest(), sheets,
+                             cleanup=lambda: os.path.exists(path) and os.remove(path))
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/database', methods=['POST'])
+def submit_database_job():
+    data = request.get_json(silent=True) or {}
+    action = data.get("action", "load_table")
+    if action not in ["load_table", "query"]:
+        return jsonify({"error": "Ação inválida. Use 'load_table' ou 'query'."}), 400
+    table_name = data.get("table_name")
+    if not table_name:
+        return jsonify({"error": "Nome da tabela não fornecido."}), 400
+    query = data.get("query") or {}
+    if not isinstance(query, dict):
+        return jsonify({"error": "A consulta deve ser um objeto JSON."}), 400
+
+    job = job_manager.submit(session_owner(), action, table_name, database_job, action, table_name,
+                             data.get("columns") or None, data.get("limit"), query, session.get('db_type'))
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    try:
+        return jsonify(job_manager.get(job_id, session_owner()).to_dict())
+    except KeyError:
+        return jsonify({"error": f"Job '{job_id}' não encontrado."}), 404
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    try:
+        return jsonify(job_manager.cancel(job_id, session_owner()).to_dict())
+    except KeyError:
+        return jsonify({"error": f"Job '{job_id}' não encontrado."}), 404
+
 @app.route('/clean_data', methods=['POST'])
 def clean_data():
-    global df
     try:
-        data = request.get_json().get("data", [])
-        if not data:
+        data = request.get_json()
+        dataset = get_request_dataset(data)
+        # A versão é lida antes da tabela: se outra alteração terminar antes desta, a atualização é recusada
+        version = dataset.version
+        df = dataset.df
+        if df.empty:
             return jsonify({"error": "Nenhum dado para limpar."}), 400
 
-        cleaned_data = [row for row in data if all(value.strip() for value in row.values())]
+        # Sem regras, remove as linhas que possuem alguma célula vazia
+        with stage('compute'):
+            cleaned, report = clean_frame(df, parse_rules(data.get('rules')))
 
-        return jsonify(cleaned_data)
+        operation = checkpoint_operation("Limpou dados", df, cleaned, dataset.nbytes)
+        dataset = dataset_store.update(dataset.id, dataset.owner, cleaned, operation, version)
+        return dataset_response(dataset, extra={"cleaning_report": report})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/calcular_nova_coluna', methods=['POST'])
 def calcular_nova_coluna():
-    global df   
     data = request.json
-    print(data.get('formula'))
-    print(data.get('new_column'))
-    df= pd.DataFrame(data['data'])
     formula = data.get('formula')
     new_column_name = data.get('new_column')
-    print(formula)
 
     if not formula:
         return jsonify({"error": "Fórmula não fornecida"}), 400
     if not new_column_name:
         new_column_name = f"{formula} (Nova)"
 
-    # Substituir os nomes das colunas por df['coluna']
-    for col in df.columns:
-        if col in formula:
-            # Converter a coluna para tipo numérico, substituindo erros por NaN
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            formula = formula.replace(col, f"df['{col}']")
-    
     try:
-        # Avaliar a fórmula
-        df[new_column_name] = eval(formula)
+        dataset = get_request_dataset(data)
+        version = dataset.version
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
 
-        # Converter NaN para "null" para compatibilidade JSON
-        data = df.fillna("null").to_dict(orient='records')
-        return jsonify(data)
+    try:
+        # Avaliar a fórmula (compilada e vetorizada, sem eval)
+        with stage('compute'):
+            updated = transforms.add_formula_columns(dataset.df, [(new_column_name, formula)])
+
+        before = dataset.df[new_column_name] if new_column_name in dataset.df.columns else None
+        operation = column_operation(f"Criou coluna '{new_column_name}' = {formula}", new_column_name,
+                                     before, updated[new_column_name])
+        dataset = dataset_store.update(dataset.id, dataset.owner, updated, operation, version)
+        return dataset_response(dataset)
+    except ValueError as e:
+        app.logger.warning("Erro ao aplicar fórmula: %s", e)
+        return jsonify({"error": str(e)}), 400
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
-        print("Erro ao aplicar fórmula:", str(e))
+        app.logger.exception("Erro ao aplicar fórmula")
         return jsonify({"error": str(e)}), 500
     
 
 @app.route('/transpor', methods=['POST'])
 def transpor():
-    global df
     try:
         data = request.get_json()
-        
-        if 'data' not in data:
-            return jsonify({"error": "Dados não fornecidos."}), 400
-        
-        # Cria um DataFrame a partir dos dados recebidos
-        df = pd.DataFrame(data['data'])
-        
-        columns_as_first_row = pd.DataFrame([df.columns.tolist()], columns=df.columns)
-        
-        # Adiciona os nomes das colunas como a primeira linha
-        df = pd.concat([columns_as_first_row, df], ignore_index=True)
-        
-        df_transposto = df.T
-        result = df_transposto.to_dict(orient='records')
-        return jsonify(result)
+        dataset = get_request_dataset(data)
+        version = dataset.version
+        with stage('compute'):
+            df_transposto = reshape.transpose(dataset.df, data.get('header_column'))
+        operation = checkpoint_operation("Transpôs a tabela", dataset.df, df_transposto, dataset.nbytes)
+        dataset = dataset_store.update(dataset.id, dataset.owner, df_transposto, operation, version)
+        return dataset_response(dataset)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/reshape', methods=['POST'])
+def reshape_dataset():
+    """Reorganiza o dataset: transpose, melt (colunas em linhas) ou pivot (linhas em colunas, com agregação)."""
+    data = request.get_json(silent=True) or {}
+    operations = {
+        'transpose': (lambda df: reshape.transpose(df, data.get('header_column')), "Transpôs a tabela"),
+        'melt': (lambda df: reshape.melt(df, data.get('id_vars'), data.get('value_vars'),
+                                         data.get('var_name') or 'variavel', data.get('value_name') or 'valor'),
+                 "Converteu colunas em linhas"),
+        'pivot': (lambda df: reshape.pivot(df, data.get('index'), data.get('columns'), data.get('values'),
+                                           data.get('aggfunc') or 'sum'),
+                  "Converteu linhas em colunas"),
+    }
+    op = data.get('op')
+    if op not in operations:
+        return jsonify({"error": f"Operação inválida. Opções válidas: {list(operations)}"}), 400
+
+    try:
+        dataset = get_request_dataset(data)
+        version = dataset.version
+        func, label = operations[op]
+        with stage('compute'):
+            df = func(dataset.df)
+        operation = checkpoint_operation(label, dataset.df, df, dataset.nbytes)
+        dataset = dataset_store.update(dataset.id, dataset.owner, df, operation, version)
+        return dataset_response(dataset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/rename_column', methods=['POST'])
 def rename_column():
-    global df
     data = request.json
     current_column = data.get('currentColumn')
     new_column_name = data.get('newColumnName')
-    df = pd.DataFrame(data['rawData'])
 
     if not current_column or not new_column_name:
         return jsonify({"error": "Nome atual e novo nome são necessários."}), 400
 
-    # Verifique se a coluna atual existe no DataFrame
-    if current_column not in df.columns:
-        return jsonify({"error": f"A coluna '{current_column}' não existe."}), 400
+    try:
+        dataset = get_request_dataset(data)
+        version = dataset.version
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
 
-    # Renomeia a coluna
-    df.rename(columns={current_column: new_column_name}, inplace=True)
-    # save_state(df, f"Renomeou coluna '{current_column}' para '{new_column_name}'")
-    print(df.head())
+    # Renomeia a coluna (verifica se a coluna atual existe e se o novo nome está livre)
+    try:
+        with stage('compute'):
+            df = transforms.rename_columns(dataset.df, {current_column: new_column_name})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    operation = rename_operation(current_column, new_column_name)
+    try:
+        dataset = dataset_store.update(dataset.id, dataset.owner, df, operation, version)
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
     # Retorne o DataFrame atualizado
-    data = df.fillna("null").to_dict(orient='records')
-    return jsonify(data)
+    return dataset_response(dataset)
 
 @app.route('/replace_value', methods=['POST'])
 def replace_value():
-    global df
     data = request.json
     column = data.get('column')
     old_value = data.get('oldValue')
     new_value = data.get('newValue')
-    df = pd.DataFrame(data['data'])
-    print(column, old_value, new_value)
 
     # Verifica se os parâmetros estão presentes
     if not column or old_value is None or new_value is None:
         return jsonify({"error": "Parâmetros incompletos"}), 400
 
     try:
-        # Converte os valores para numéricos (inteiros ou flutuantes)
-        old_value = float(old_value)
-        new_value = float(new_value)
-
-        # Converte a coluna para tipo numérico antes de substituir os valores
-        df[column] = pd.to_numeric(df[column], errors='coerce')
+        dataset = get_request_dataset(data)
+        version = dataset.version
+        # Converte a coluna para tipo numérico e substitui o valor antigo pelo novo
+        with stage('compute'):
+            df = transforms.replace_values(dataset.df, column, {old_value: new_value})
+
+        operation = column_operation(f"Substituiu {old_value} por {new_value} na coluna '{column}'",
+                                     column, dataset.df[column], df[column])
+        dataset = dataset_store.update(dataset.id, dataset.owner, df, operation, version)
+        return dataset_response(dataset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Substitui o valor antigo pelo novo
-        df[column] = df[column].replace(old_value, new_value)
 
-        print(df.head())
-        
-        # Preenche valores NaN com "null" para compatibilidade JSON
-        updated_data = df.fillna("null").to_dict(orient='records')
-        return jsonify(updated_data)
+@app.route('/pipeline', methods=['POST'])
+def run_pipeline_request():
+    """
+    Executa uma lista de etapas (ou uma receita salva) sobre o dataset em uma
+    única requisição. Etapas adjacentes coluna a coluna são unidas antes da execução.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        dataset = get_request_dataset(data)
+        version = dataset.version
+        recipe = data.get('recipe')
+        steps = recipe_store.load(recipe) if recipe else data.get('steps')
+        with stage('compute'):
+            df, plan = run_pipeline(dataset.df, steps)
+
+        save_as = data.get('save_as')
+        if save_as:
+            recipe_store.save(save_as, steps)
+
+        label = f"Receita '{recipe}'" if recipe else f"Pipeline com {len(steps)} etapa(s)"
+        operation = checkpoint_operation(label, dataset.df, df, dataset.nbytes)
+        dataset = dataset_store.update(dataset.id, dataset.owner, df, operation, version)
+        return dataset_response(dataset, f"{len(steps)} etapa(s) executada(s) em {len(plan)} passo(s).")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except DatasetConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/pipeline/recipes', methods=['GET', 'POST'])
+def pipeline_recipes():
+    if request.method == 'GET':
+        return jsonify(recipe_store.list())
+    data = request.get_json(silent=True) or {}
+    try:
+        recipe_store.save(data.get('name'), data.get('steps'))
+        return jsonify({"message": f"Receita '{data.get('name')}' salva com sucesso."})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/get_history', methods=['GET'])
+def get_history():
+    try:
+        dataset = get_request_dataset(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify(dataset.history.to_list())
+
+@app.route('/undo', methods=['POST'])
+def undo():
+    try:
+        dataset = get_request_dataset(request.get_json(silent=True))
+        dataset = dataset_store.undo(dataset.id, dataset.owner)
+        return dataset_response(dataset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route('/redo', methods=['POST'])
+def redo():
+    try:
+        dataset = get_request_dataset(request.get_json(silent=True))
+        dataset = dataset_store.redo(dataset.id, dataset.owner)
+        return dataset_response(dataset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas no formato texto do Prometheus: requisições e etapas por rota, mais o estado dos caches e jobs."""
+    store = dataset_store.stats()
+    cache = upload_cache.stats()
+    gauges = [
+        ('gmaster_datasets', 'Datasets carregados na memória.', {}, store['datasets']),
+        ('gmaster_dataset_bytes', 'Memória ocupada pelos datasets.', {}, store['total_bytes']),
+        ('gmaster_dataset_max_bytes', 'Limite de memória dos datasets.', {}, store['max_bytes']),
+        ('gmaster_upload_cache_bytes', 'Tamanho em disco do cache de uploads.', {}, cache['bytes']),
+        ('gmaster_upload_cache_hits', 'Acertos do cache de uploads.', {}, cache['hits']),
+        ('gmaster_upload_cache_misses', 'Falhas do cache de uploads.', {}, cache['misses']),
+    ]
+    for state, count in job_manager.stats().items():
+        gauges.append(('gmaster_jobs', 'Jobs conhecidos por estado.', {'state': state}, count))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Pilhas amostradas de uma requisição perfilada (formato collapsed, para flamegraph)."""
+    if profile_id not in profiles:
+        return jsonify({"error": f"Perfil '{profile_id}' não encontrado."}), 404
+    return Response(profiles[profile_id], mimetype='text/plain')
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=os.getenv('GMASTER_LOG_LEVEL', 'INFO'))
     app.run(debug=True)
-    
-    
@@ -0,0 +1,63 @@
+"""
+Compara a leitura de XML e XLSX pelos caminhos antigos (`pd.read_xml` e
+`pd.read_excel` com openpyxl) e pelos novos (`iterparse` e leitura em modo
+streaming), em arquivos gerados.
+
+Uso: python benchmarks/bench_ingest.py [linhas]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import read_xml_file, read_xlsx_file  # noqa: E402
+from benchmarks.generate import generate_frame, write_xml, write_xlsx  # noqa: E402
+
+
+def read_xml_pandas(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_xml(path)
+    except ImportError:  # Sem lxml, o pandas usa o parser da biblioteca padrão
+        return pd.read_xml(path, parser='etree')
+
+
+def measure(label: str, func):
+    """Mede o tempo em uma execução e o pico de memória (tracemalloc, que deixa a leitura mais lenta) em outra."""
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {elapsed:8.2f} s {peak / 1024 ** 2:10.1f} MB {len(df):>10} linhas")
+    return elapsed
+
+
+def main(rows: int):
+    df = generate_frame(rows)
+    with tempfile.TemporaryDirectory(prefix='gmaster_bench_') as directory:
+        xml_path = os.path.join(directory, 'dados.xml')
+        xlsx_path = os.path.join(directory, 'dados.xlsx')
+        write_xml(df, xml_path)
+        write_xlsx(df, xlsx_path, sheets=4)
+        print(f"XML: {os.path.getsize(xml_path) / 1024 ** 2:.1f} MB, "
+              f"XLSX: {os.path.getsize(xlsx_path) / 1024 ** 2:.1f} MB, {rows} linhas\n")
+        print(f"{'caminho':<40} {'tempo':>10} {'pico de memória':>13} {'resultado':>17}")
+
+        measure('xml: pd.read_xml (antigo)', lambda: read_xml_pandas(xml_path))
+        measure('xml: iterparse (novo)', lambda: read_xml_file(xml_path))
+        measure('xlsx 1 planilha: pd.read_excel (antigo)', lambda: pd.read_excel(xlsx_path))
+        measure('xlsx 1 planilha: streaming (novo)', lambda: read_xlsx_file(xlsx_path))
+        measure('xlsx 4 planilhas: pd.read_excel (antigo)',
+                lambda: pd.concat(pd.read_excel(xlsx_path, sheet_name=None).values(), ignore_index=True))
+        measure('xlsx 4 planilhas: paralelo (novo)', lambda: read_xlsx_file(xlsx_path, '*'))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,121 @@
+"""
+Geração dos dados sintéticos usados nos benchmarks: um DataFrame com colunas
+numéricas, de texto repetitivo, datas e nulos, gravado em cada formato aceito
+no upload e em uma tabela SQLite.
+"""
+import os
+import json
+import sqlite3
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Formatos de upload gerados e o limite de linhas de cada um (XLSX e XML são lentos de gerar e ler)
+FORMAT_MAX_ROWS = {
+    'csv': None,
+    'txt': None,
+    'json': 1_000_000,
+    'zip': None,
+    'xml': 1_000_000,
+    'xlsx': 100_000,
+}
+
+CITIES = ['Sao Paulo', 'Rio de Janeiro', 'Recife', 'Curitiba', 'Porto Alegre', 'Manaus']
+
+
+def generate_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(0, 1000, rows).astype('float64')
+    quantity[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'valor': rng.random(rows).round(4) * 1000,
+        'quantidade': quantity,
+        'cidade': rng.choice(CITIES, rows),
+        'codigo': [f"C{value:07d}" for value in rng.integers(0, rows, rows)],
+        'data': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, rows), unit='D'),
+    })
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    df.to_csv(path, index=False)
+
+
+def write_txt(df: pd.DataFrame, path: str):
+    """TXT delimitado por '|' com delimitadores extras no início e no fim, sem cabeçalho."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for start in range(0, len(df), 100_000):
+            text = df.iloc[start:start + 100_000].to_csv(sep='|', header=False, index=False)
+            f.write(''.join(f'|{line}|\n' for line in text.splitlines()))
+
+
+def write_json(df: pd.DataFrame, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(json.loads(df.to_json(orient='records', date_format='iso')), f)
+
+
+def write_xml(df: pd.DataFrame, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<dados>\n')
+        for row in df.astype(str).itertuples(index=False):
+            f.write('  <registro>' + ''.join(f'<{col}>{value}</{col}>' for col, value in zip(df.columns, row))
+                    + '</registro>\n')
+        f.write('</dados>\n')
+
+
+def write_xlsx(df: pd.DataFrame, path: str, sheets: int = 1):
+    size = -(-len(df) // sheets)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for index in range(sheets):
+            part = df.iloc[index * size:(index + 1) * size]
+            part.to_excel(writer, sheet_name=f'Planilha{index + 1}', index=False)
+
+
+def write_zip(df: pd.DataFrame, path: str, members: int = 4):
+    """ZIP com o CSV dividido em vários arquivos (lidos em paralelo no upload)."""
+    size = -(-len(df) // members)
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for index in range(members):
+            part = df.iloc[index * size:(index + 1) * size]
+            archive.writestr(f'parte{index + 1}.csv', part.to_csv(index=False))
+
+
+WRITERS = {
+    'csv': write_csv,
+    'txt': write_txt,
+    'json': write_json,
+    'xml': write_xml,
+    'xlsx': write_xlsx,
+    'zip': write_zip,
+}
+
+
+def write_sqlite(df: pd.DataFrame, path: str, table_name: str):
+    with sqlite3.connect(path) as conn:
+        df.to_sql(table_name, conn, if_exists='replace', index=False, chunksize=50_000)
+
+
+def ensure_inputs(directory: str, rows: int, formats):
+    """
+    Gera (uma única vez por tamanho) os arquivos de entrada em `directory`.
+    Retorna {formato: caminho}, sem os formatos acima do limite de linhas.
+    """
+    os.makedirs(directory, exist_ok=True)
+    df = None
+    paths = {}
+    for fmt in formats:
+        limit = FORMAT_MAX_ROWS[fmt]
+        if limit is not None and rows > limit:
+            continue
+        path = os.path.join(directory, f"dados_{rows}.{fmt}")
+        if not os.path.exists(path):
+            if df is None:
+                df = generate_frame(rows)
+            print(f"Gerando {path}...")
+            # Grava com nome temporário (mantendo a extensão) para não deixar arquivos incompletos
+            tmp_path = os.path.join(directory, f"tmp_dados_{rows}.{fmt}")
+            WRITERS[fmt](df, tmp_path)
+            os.replace(tmp_path, path)
+        paths[fmt] = path
+    return paths
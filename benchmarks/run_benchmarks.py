@@ -0,0 +1,363 @@
+"""
+Benchmark das rotas da aplicação sobre dados sintéticos.
+
+Gera entradas CSV/TXT/JSON/XML/XLSX/ZIP e uma tabela SQLite em cada tamanho
+pedido, executa as rotas pelo test client do Flask e registra, para cada
+chamada, o tempo, o pico de memória residente (RSS) e o tamanho da resposta.
+O resultado é gravado em JSON para comparação entre versões.
+
+Uso:
+    python benchmarks/run_benchmarks.py --sizes 10k,100k
+    python benchmarks/run_benchmarks.py --sizes 1m --formats csv,zip --compare benchmarks/results/anterior.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import threading
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd  # noqa: E402
+from dotenv import dotenv_values  # noqa: E402
+
+from benchmarks.generate import FORMAT_MAX_ROWS, ensure_inputs, generate_frame, write_sqlite  # noqa: E402
+
+COLUMNAR = 'application/vnd.gmaster.columnar+json'
+ARROW = 'application/vnd.apache.arrow.stream'
+# Tabela SQLite gerada para as rotas de banco
+DB_TABLE = 'bench_dados'
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def current_rss() -> int:
+    """RSS atual do processo, em bytes (Linux); fora do Linux usa o pico do processo."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """Amostra o RSS em segundo plano durante uma chamada e guarda o maior valor."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class Runner:
+    """Executa as rotas pelo test client e acumula os resultados."""
+
+    def __init__(self, client):
+        self.client = client
+        self.results = []
+
+    def call(self, size: int, source: str, name: str, method: str, url: str, **kwargs):
+        """Executa a requisição medindo tempo, pico de RSS e bytes da resposta (lendo respostas em stream)."""
+        before = current_rss()
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            body = response.get_data()
+            elapsed = time.perf_counter() - start
+        # Fecha a resposta como o servidor WSGI, para que /metrics registre a requisição
+        response.close()
+        result = {
+            'rows': size,
+            'source': source,
+            'route': name,
+            'status': response.status_code,
+            'seconds': round(elapsed, 4),
+            'peak_rss_mb': round(sampler.peak / 1024 ** 2, 1),
+            'rss_growth_mb': round((sampler.peak - before) / 1024 ** 2, 1),
+            'response_bytes': len(body),
+        }
+        self.results.append(result)
+        status = '' if response.status_code < 400 else f"  [{response.status_code}]"
+        print(f"{size:>10} {source:<8} {name:<28} {elapsed:9.3f} s {result['peak_rss_mb']:9.1f} MB "
+              f"{len(body):>12} B{status}")
+        return response
+
+    def upload(self, size: int, source: str, path: str, route: str = '/upload', name: str = None):
+        with open(path, 'rb') as f:
+            return self.call(size, source, name or route, 'post', route, headers={'Accept': COLUMNAR},
+                             data={'file': (f, os.path.basename(path))}, content_type='multipart/form-data')
+
+    def json(self, size: int, source: str, name: str, url: str, payload: dict, accept: str = COLUMNAR):
+        return self.call(size, source, name, 'post', url, json=payload, headers={'Accept': accept})
+
+
+def wait_job(runner: Runner, size: int, source: str, name: str, response, start: float):
+    """Acompanha o job (GET /jobs/<id>) até terminar e registra o tempo total desde o envio."""
+    if response.status_code != 202:
+        return None
+    job_id = response.get_json()['job_id']
+    while True:
+        job = runner.client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] not in ('pending', 'running'):
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    runner.results.append({
+        'rows': size, 'source': source, 'route': name,
+        'status': 200 if job['status'] == 'done' else 500,
+        'seconds': round(elapsed, 4),
+        'peak_rss_mb': round(current_rss() / 1024 ** 2, 1), 'rss_growth_mb': None, 'response_bytes': None,
+    })
+    print(f"{size:>10} {source:<8} {name:<28} {elapsed:9.3f} s")
+    return job
+
+
+def run_job(runner: Runner, size: int, source: str, path: str):
+    """Upload por job: mede o envio, o tempo até o dataset ficar pronto e o cancelamento de um segundo job."""
+    start = time.perf_counter()
+    response = runner.upload(size, source, path, '/jobs/upload')
+    wait_job(runner, size, source, '/jobs/upload (concluído)', response, start)
+
+    response = runner.upload(size, source, path, '/jobs/upload')
+    if response.status_code == 202:
+        runner.call(size, source, '/jobs/<id>/cancel', 'post', f"/jobs/{response.get_json()['job_id']}/cancel")
+        wait_job(runner, size, source, '/jobs/upload (cancelado)', response, time.perf_counter())
+
+
+def run_cached_upload(runner: Runner, upload_cache, size: int, source: str, path: str):
+    """Mesmo arquivo enviado duas vezes com o cache de uploads ativo: leitura completa e acerto no cache."""
+    enabled = upload_cache.enabled
+    upload_cache.enabled = True
+    try:
+        runner.upload(size, source, path, name='/upload (cache miss)')
+        runner.upload(size, source, path, name='/upload (cache hit)')
+    finally:
+        upload_cache.enabled = enabled
+    runner.call(size, source, '/upload/cache', 'get', '/upload/cache')
+
+
+def run_dataset_routes(runner: Runner, size: int, source: str, dataset_id: str):
+    """Rotas que operam sobre o dataset do servidor: janelas, formatos, transformações e histórico."""
+    rows = f'/datasets/{dataset_id}/rows'
+    runner.call(size, source, 'rows (records)', 'get', f'{rows}?offset=0&limit=100',
+                headers={'Accept': 'application/json'})
+    runner.call(size, source, 'rows (columnar)', 'get', f'{rows}?offset=0&limit=100', headers={'Accept': COLUMNAR})
+    runner.call(size, source, 'rows (arrow)', 'get', f'{rows}?offset=0&limit=100', headers={'Accept': ARROW})
+    runner.call(size, source, 'rows (fim)', 'get', f'{rows}?offset={max(size - 100, 0)}&limit=100',
+                headers={'Accept': COLUMNAR})
+    runner.call(size, source, 'rows (sort)', 'get', f'{rows}?offset=0&limit=100&sort=valor&order=desc',
+                headers={'Accept': COLUMNAR})
+    runner.call(size, source, 'rows (search)', 'get', f'{rows}?offset=0&limit=100&search=recife',
+                headers={'Accept': COLUMNAR})
+    runner.call(size, source, 'profile', 'get', f'/datasets/{dataset_id}/profile')
+    runner.call(size, source, 'profile (cache)', 'get', f'/datasets/{dataset_id}/profile')
+    # Requisição com o profiler por amostragem e leitura do perfil gerado
+    response = runner.call(size, source, 'rows (sort, _profile)', 'get',
+                           f'{rows}?offset=0&limit=100&sort=codigo&_profile=1', headers={'Accept': COLUMNAR})
+    profile_id = response.headers.get('X-Gmaster-Profile-Id')
+    if profile_id:
+        runner.call(size, source, '/profiles/<id>', 'get', f'/profiles/{profile_id}')
+
+    payload = {'dataset_id': dataset_id}
+    runner.json(size, source, '/calcular_nova_coluna', '/calcular_nova_coluna',
+                {**payload, 'formula': 'valor * quantidade + 1', 'new_column': 'total'})
+    runner.json(size, source, '/replace_value', '/replace_value',
+                {**payload, 'column': 'quantidade', 'oldValue': 1, 'newValue': 2})
+    runner.json(size, source, '/rename_column', '/rename_column',
+                {**payload, 'currentColumn': 'total', 'newColumnName': 'valor_total'})
+    runner.json(size, source, '/clean_data', '/clean_data',
+                {**payload, 'rules': {'trim': True, 'normalize_nulls': True, 'dedupe': ['codigo']}})
+    runner.call(size, source, '/get_history', 'get', f'/get_history?dataset_id={dataset_id}')
+    runner.json(size, source, '/undo', '/undo', payload)
+    runner.json(size, source, '/redo', '/redo', payload)
+    runner.json(size, source, '/pipeline', '/pipeline', {**payload, 'steps': [
+        {'op': 'rename_column', 'currentColumn': 'valor_total', 'newColumnName': 'vt'},
+        {'op': 'calcular_nova_coluna', 'formula': 'vt / 2', 'new_column': 'metade'},
+        {'op': 'clean_data'},
+    ]})
+    runner.json(size, source, '/reshape (pivot)', '/reshape',
+                {**payload, 'op': 'pivot', 'index': 'cidade', 'columns': 'quantidade', 'values': 'valor'})
+    # O pivot tem uma linha por cidade: a transposição dele cabe no limite de colunas em qualquer tamanho
+    runner.json(size, source, '/transpor (pivot)', '/transpor', payload)
+    runner.json(size, source, '/reshape (transpose, pivot)', '/reshape', {**payload, 'op': 'transpose'})
+    for name in ('/undo (transpose, pivot)', '/undo (transpor, pivot)', '/undo (pivot)'):
+        runner.json(size, source, name, '/undo', payload)
+    runner.call(size, source, '/pipeline/recipes (GET)', 'get', '/pipeline/recipes')
+    runner.json(size, source, '/pipeline/recipes (POST)', '/pipeline/recipes', {'name': 'bench', 'steps': [
+        {'op': 'clean_data'}]})
+    runner.json(size, source, '/reshape (melt)', '/reshape',
+                {**payload, 'op': 'melt', 'id_vars': ['id'], 'value_vars': ['valor', 'quantidade'],
+                 'value_name': 'medida'})
+    runner.json(size, source, '/undo (melt)', '/undo', payload)
+    # A tabela inteira vira uma coluna por linha: acima do limite de colunas a rota responde 400,
+    # e a recusa fica registrada como resultado
+    if runner.json(size, source, '/transpor', '/transpor', payload).status_code == 200:
+        runner.json(size, source, '/undo (transpor)', '/undo', payload)
+    if runner.json(size, source, '/reshape (transpose)', '/reshape', {**payload, 'op': 'transpose'}).status_code == 200:
+        runner.json(size, source, '/undo (transpose)', '/undo', payload)
+
+    for fmt in ('csv', 'parquet', 'xlsx'):
+        if fmt == 'xlsx' and size > FORMAT_MAX_ROWS['xlsx']:
+            continue
+        runner.call(size, source, f'export ({fmt})', 'get', f'/datasets/{dataset_id}/export?format={fmt}')
+
+
+def run_database_routes(runner: Runner, size: int):
+    """Rotas de banco sobre a tabela SQLite gerada."""
+    runner.json(size, 'sqlite', 'set_database', '/database', {'action': 'set_database', 'db_type': 'sqlite'})
+    response = runner.json(size, 'sqlite', 'load_table', '/database', {'action': 'load_table', 'table_name': DB_TABLE})
+    runner.json(size, 'sqlite', 'load_table (stream)', '/database',
+                {'action': 'load_table', 'table_name': DB_TABLE, 'stream': True})
+    runner.json(size, 'sqlite', 'query (agregação)', '/database', {'action': 'query', 'table_name': DB_TABLE, 'query': {
+        'group_by': ['cidade'], 'aggregations': [{'func': 'sum', 'column': 'valor'}, {'func': 'count'}]}})
+    runner.json(size, 'sqlite', 'query (filtro)', '/database', {'action': 'query', 'table_name': DB_TABLE, 'query': {
+        'filters': [{'column': 'valor', 'op': 'gt', 'value': 900}], 'limit': 1000}})
+    runner.json(size, 'sqlite', 'pool_stats', '/database', {'action': 'pool_stats'})
+    if response.status_code == 200:
+        dataset_id = response.get_json()['dataset_id']
+        runner.json(size, 'sqlite', 'write_table', '/database', {
+            'action': 'write_table', 'dataset_id': dataset_id, 'table_name': f'{DB_TABLE}_saida', 'if_exists': 'replace'})
+    start = time.perf_counter()
+    job = runner.json(size, 'sqlite', '/jobs/database', '/jobs/database', {'action': 'load_table', 'table_name': DB_TABLE})
+    wait_job(runner, size, 'sqlite', '/jobs/database (concluído)', job, start)
+    start = time.perf_counter()
+    job = runner.json(size, 'sqlite', '/jobs/database (query)', '/jobs/database', {
+        'action': 'query', 'table_name': DB_TABLE, 'query': {'filters': [{'column': 'valor', 'op': 'gt', 'value': 500}]}})
+    wait_job(runner, size, 'sqlite', '/jobs/database (query, fim)', job, start)
+
+
+def sqlite_database_path(workdir: str):
+    """Caminho do banco SQLite configurado, relativo ao diretório de trabalho do benchmark."""
+    config = dotenv_values(os.path.join(BASE_DIR, 'sqlite_config.env'))
+    name = (config.get('DB_NAME') or '').strip()
+    if not name or os.path.isabs(name):
+        # Um caminho absoluto apontaria para o banco real; as rotas de banco são puladas
+        return None
+    return os.path.join(workdir, name)
+
+
+def compare(results, previous_path: str):
+    """Imprime a razão de tempo em relação a um resultado anterior (>1 = mais lento)."""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    baseline = {(r['rows'], r['source'], r['route']): r for r in previous['results']}
+    print(f"\nComparação com {previous_path} ({previous.get('revision')}):")
+    for result in results:
+        old = baseline.get((result['rows'], result['source'], result['route']))
+        if not old or not old['seconds']:
+            continue
+        ratio = result['seconds'] / old['seconds']
+        flag = '  <-- regressão' if ratio > 1.2 and result['seconds'] - old['seconds'] > 0.05 else ''
+        print(f"{result['rows']:>10} {result['source']:<8} {result['route']:<28} "
+              f"{old['seconds']:9.3f} s -> {result['seconds']:9.3f} s ({ratio:5.2f}x){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10k,100k', help="tamanhos (linhas), ex.: 10k,100k,1m,10m")
+    parser.add_argument('--formats', default=','.join(FORMAT_MAX_ROWS), help="formatos de upload")
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'benchmarks', 'data'),
+                        help="diretório dos arquivos gerados (reaproveitados entre execuções)")
+    parser.add_argument('--output', default=None, help="arquivo JSON de saída")
+    parser.add_argument('--compare', default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--with-cache', action='store_true',
+                        help="mantém o cache de uploads ativo em todos os uploads (sempre medido no cenário de cache)")
+    parser.add_argument('--skip-database', action='store_true', help="não executa as rotas de banco")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMAT_MAX_ROWS]
+    if unknown:
+        parser.error(f"formatos inválidos: {unknown}")
+
+    workdir = tempfile.mkdtemp(prefix='gmaster_bench_')
+    # A aplicação é importada depois de configurar o ambiente do benchmark
+    os.environ.setdefault('GMASTER_RECIPES_DIR', os.path.join(workdir, 'recipes'))
+    os.environ.setdefault('GMASTER_UPLOAD_CACHE_DIR', os.path.join(workdir, 'upload_cache'))
+    os.environ.setdefault('GMASTER_DATASET_MEMORY_MB', '16384')
+    # O profiler só atende requisições que o pedem (?_profile=1)
+    os.environ['GMASTER_PROFILING_ENABLED'] = '1'
+    os.chdir(workdir)
+    from app import app, upload_cache
+
+    # Sem --with-cache, os uploads leem o arquivo sempre; o cache é ligado só no cenário de cache
+    upload_cache.enabled = args.with_cache
+    runner = Runner(app.test_client())
+    runner.call(0, '-', '/', 'get', '/')
+    database_path = None if args.skip_database else sqlite_database_path(workdir)
+    print(f"{'linhas':>10} {'origem':<8} {'rota':<28} {'tempo':>11} {'pico RSS':>12} {'resposta':>14}")
+    for size in sizes:
+        paths = ensure_inputs(args.data_dir, size, formats)
+        for source, path in paths.items():
+            response = runner.upload(size, source, path)
+            if source == 'csv':
+                run_cached_upload(runner, upload_cache, size, source, path)
+                run_job(runner, size, source, path)
+                if response.status_code == 200:
+                    run_dataset_routes(runner, size, source, response.get_json()['dataset_id'])
+        if database_path:
+            write_sqlite(generate_frame(size), database_path, DB_TABLE)
+            run_database_routes(runner, size)
+        runner.call(size, '-', '/metrics', 'get', '/metrics')
+
+    output = args.output or os.path.join(
+        BASE_DIR, 'benchmarks', 'results', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sizes': sizes,
+        'formats': formats,
+        'upload_cache': args.with_cache,
+        'results': runner.results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {output}")
+
+    if args.compare:
+        compare(runner.results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import pandas as pd
+
+# Textos tratados como nulos (comparados sem espaços e sem diferenciar maiúsculas)
+NULL_SENTINELS = ('', 'null', 'none', 'nan', 'n/a', 'na', '#n/a', '-')
+
+# Tipos aceitos na regra `coerce`
+COERCE_TYPES = ('int', 'float', 'string', 'bool', 'datetime')
+
+_TRUE_VALUES = ('true', '1', 'sim', 's', 'yes', 'y', 'verdadeiro')
+_FALSE_VALUES = ('false', '0', 'nao', 'não', 'n', 'no', 'falso')
+
+# Regras na ordem em que são aplicadas. Sem regras informadas, mantém o
+# comportamento original: remover linhas com alguma célula vazia.
+RULE_ORDER = ('trim', 'normalize_nulls', 'coerce', 'drop_blank', 'dedupe')
+DEFAULT_RULES = {'drop_blank': True}
+
+
+def _strip(series: pd.Series):
+    """Remove espaços das células de texto. Retorna None para colunas sem texto."""
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return None
+    try:
+        return series.str.strip()
+    except AttributeError:  # Coluna object sem nenhum texto (ex.: apenas números ou datas)
+        return None
+
+
+def _select_columns(df: pd.DataFrame, columns, rule: str):
+    """`True` seleciona todas as colunas; uma lista seleciona as informadas."""
+    if columns is True:
+        return list(df.columns)
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Regra '{rule}': colunas inexistentes {missing}.")
+    return list(columns)
+
+
+def parse_rules(rules) -> dict:
+    """
+    Valida as regras de limpeza:
+
+    - trim / normalize_nulls / drop_blank / dedupe: `true` (todas as colunas) ou lista de colunas;
+    - coerce: {coluna: tipo}, com tipo em COERCE_TYPES.
+    """
+    if rules is None:
+        return dict(DEFAULT_RULES)
+    if not isinstance(rules, dict):
+        raise ValueError("As regras de limpeza devem ser um objeto JSON.")
+    unknown = [rule for rule in rules if rule not in RULE_ORDER]
+    if unknown:
+        raise ValueError(f"Regras de limpeza inválidas {unknown}. Opções válidas: {list(RULE_ORDER)}")
+
+    parsed = {}
+    for rule, value in rules.items():
+        if rule == 'coerce':
+            if not isinstance(value, dict):
+                raise ValueError("Regra 'coerce': informe um objeto {coluna: tipo}.")
+            invalid = {col: kind for col, kind in value.items() if kind not in COERCE_TYPES}
+            if invalid:
+                raise ValueError(f"Regra 'coerce': tipos inválidos {invalid}. Opções válidas: {list(COERCE_TYPES)}")
+            if value:
+                parsed[rule] = value
+        elif value is True or (isinstance(value, list) and value):
+            parsed[rule] = value
+        elif value not in (False, None, []):
+            raise ValueError(f"Regra '{rule}': use true ou uma lista de colunas.")
+    return parsed
+
+
+def _trim(df: pd.DataFrame, columns):
+    changed = pd.Series(False, index=df.index)
+    updated = {}
+    for col in columns:
+        series = df[col]
+        stripped = _strip(series)
+        if stripped is None:
+            continue
+        # Valores que não são texto (números em colunas mistas) são mantidos
+        stripped = stripped.where(stripped.notna(), series)
+        diff = series.notna() & (stripped != series)
+        if diff.any():
+            updated[col] = stripped
+            changed |= diff
+    return updated, changed
+
+
+def _normalize_nulls(df: pd.DataFrame, columns):
+    changed = pd.Series(False, index=df.index)
+    updated = {}
+    for col in columns:
+        series = df[col]
+        stripped = _strip(series)
+        if stripped is None:
+            continue
+        sentinel = stripped.str.lower().isin(NULL_SENTINELS)
+        if sentinel.any():
+            updated[col] = series.mask(sentinel)
+            changed |= sentinel
+    return updated, changed
+
+
+def coerce_series(series: pd.Series, kind: str) -> pd.Series:
+    """Converte a série para o tipo pedido; valores inválidos viram nulos."""
+    if kind in ('int', 'float'):
+        numeric = pd.to_numeric(series, errors='coerce')
+        if kind == 'float':
+            return numeric.astype('float64')
+        return numeric.where(numeric % 1 == 0).astype('Int64')
+    if kind == 'string':
+        return series.astype('string')
+    if kind == 'bool':
+        text = series.astype('string').str.strip().str.lower()
+        result = pd.Series(pd.NA, index=series.index, dtype='boolean')
+        result[text.isin(_TRUE_VALUES).fillna(False)] = True
+        result[text.isin(_FALSE_VALUES).fillna(False)] = False
+        return result
+    return pd.to_datetime(series, errors='coerce', format='mixed')
+
+
+def _coerce(df: pd.DataFrame, types: dict):
+    _select_columns(df, list(types), 'coerce')
+    changed = pd.Series(False, index=df.index)
+    updated = {}
+    for col, kind in types.items():
+        converted = coerce_series(df[col], kind)
+        # Conta como afetadas as linhas cujo valor não pôde ser convertido
+        changed |= df[col].notna() & converted.isna()
+        updated[col] = converted
+    return updated, changed
+
+
+def _set_columns(df: pd.DataFrame, updated: dict) -> pd.DataFrame:
+    df = df.copy(deep=False)
+    for col, series in updated.items():
+        df[col] = series
+    return df
+
+
+def _blank_mask(df: pd.DataFrame, columns) -> pd.Series:
+    blank = pd.Series(False, index=df.index)
+    for col in columns:
+        series = df[col]
+        blank |= series.isna()
+        stripped = _strip(series)
+        if stripped is not None:
+            blank |= stripped.eq('').fillna(False)
+    return blank
+
+
+def clean_frame(df: pd.DataFrame, rules: dict):
+    """
+    Aplica as regras (já validadas por `parse_rules`) em operações vetorizadas
+    sobre as colunas. Retorna o DataFrame limpo e a quantidade de linhas
+    afetadas por regra.
+    """
+    report = {}
+    for rule in RULE_ORDER:
+        if rule not in rules:
+            continue
+        value = rules[rule]
+
+        if rule in ('trim', 'normalize_nulls', 'coerce'):
+            if rule == 'coerce':
+                updated, changed = _coerce(df, value)
+            else:
+                step = _trim if rule == 'trim' else _normalize_nulls
+                updated, changed = step(df, _select_columns(df, value, rule))
+            if updated:
+                df = _set_columns(df, updated)
+            report[rule] = int(changed.sum())
+
+        elif rule == 'drop_blank':
+            blank = _blank_mask(df, _select_columns(df, value, rule))
+            report[rule] = int(blank.sum())
+            if report[rule]:
+                df = df[~blank]
+
+        elif rule == 'dedupe':
+            # `duplicated` fatoriza as colunas-chave em códigos por hash, sem comparar linha a linha
+            duplicated = df.duplicated(subset=_select_columns(df, value, rule), keep='first')
+            report[rule] = int(duplicated.sum())
+            if report[rule]:
+                df = df[~duplicated]
+
+    return df.reset_index(drop=True), report
+
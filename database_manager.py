@@ -1,9 +1,79 @@
+import io
 import os
-from dotenv import load_dotenv
+import csv
+import time
+import threading
+from dotenv import dotenv_values
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, MetaData, Table, select, Date, DateTime
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.dialects.mysql import SET
 import pandas as pd
-import numpy as np
+from query_builder import build_query
+from instrumentation import timed_iter, record_stage
+
+# Quantidade de linhas lidas por vez do cursor do banco
+DEFAULT_CHUNKSIZE = 50000
+
+# Linhas por INSERT com vários VALUES (MySQL), limitando o tamanho de cada pacote
+MULTI_INSERT_ROWS = 1000
+
+# Configuração dos pools de conexão (ajustável por variáveis de ambiente)
+POOL_OPTIONS = {
+    'pool_size': int(os.getenv('GMASTER_DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.getenv('GMASTER_DB_MAX_OVERFLOW', '10')),
+    'pool_timeout': int(os.getenv('GMASTER_DB_POOL_TIMEOUT', '30')),
+    'pool_recycle': int(os.getenv('GMASTER_DB_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': True,
+}
+
+
+def normalize_chunk(chunk: pd.DataFrame, set_columns=(), datetime_columns=()) -> pd.DataFrame:
+    """
+    Normaliza um bloco lido do banco. As colunas de data e SET (MySQL) são
+    identificadas pelo tipo reflexionado da tabela, então apenas elas são
+    convertidas, coluna a coluna; o restante do bloco mantém os tipos originais.
+    """
+    for col in datetime_columns:
+        if col in chunk.columns and not pd.api.types.is_datetime64_any_dtype(chunk[col]):
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+    for col in set_columns:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].map(sorted, na_action='ignore')
+    return chunk
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def postgres_copy(table, conn, keys, data_iter):
+    """
+    Método de inserção do `to_sql` para PostgreSQL: envia o bloco com
+    COPY ... FROM STDIN em CSV, bem mais rápido que INSERTs.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+    name = _quote_identifier(table.name)
+    if table.schema:
+        name = f"{_quote_identifier(table.schema)}.{name}"
+    sql = f"COPY {name} ({', '.join(_quote_identifier(key) for key in keys)}) FROM STDIN WITH CSV"
+    with conn.connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _collect_chunks(chunks, on_chunk=None):
+    collected = []
+    for chunk in chunks:
+        collected.append(chunk)
+        if on_chunk:
+            on_chunk(len(chunk))
+    return collected
 
 class DatabaseConnectionManager:
     def __init__(self):
@@ -27,6 +97,13 @@ class DatabaseConnectionManager:
         }
         self.current_db_type = None
         self.engine = None
+        # Registro de engines por tipo de banco: {db_type: (url, engine)}
+        self._engines = {}
+        # Metadados das tabelas já reflexionadas, por tipo de banco
+        self._metadata = {}
+        self._configs = {}
+        self._lock = threading.Lock()
+        self._reflect_lock = threading.Lock()
 
     def load_db_config(self, db_type: str):
         if db_type not in self.supported_dbs:
@@ -37,37 +114,220 @@ class DatabaseConnectionManager:
         if not env_path.exists():
             raise FileNotFoundError(f"Arquivo de configuração {env_path} não encontrado.")
         
-        load_dotenv(dotenv_path=env_path, verbose=True)
+        # O arquivo só é relido quando modificado; os valores não são exportados
+        # para os.environ, evitando que a configuração de um banco vaze para outro
+        mtime = env_path.stat().st_mtime
+        cached = self._configs.get(db_type)
+        if cached and cached[0] == mtime:
+            return cached[1], db_config['connection_string']
+
+        values = dotenv_values(env_path)
         config = {
-            'user': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD'),
-            'host': os.getenv('DB_HOST'),
-            'port': os.getenv('DB_PORT'),
-            'database': os.getenv('DB_NAME')
+            'user': (values.get('DB_USER') or '').strip(),
+            'password': (values.get('DB_PASSWORD') or '').strip(),
+            'host': (values.get('DB_HOST') or '').strip(),
+            'port': (values.get('DB_PORT') or '').strip(),
+            'database': (values.get('DB_NAME') or '').strip()
         }
+        self._configs[db_type] = (mtime, config)
         return config, db_config['connection_string']
-    
-    def configure_connection(self, db_type: str):
-        """Configura a conexão com o banco de dados."""
+
+    def get_engine(self, db_type: str):
+        """
+        Retorna a engine do tipo de banco, criando-a (com pool configurado) apenas
+        na primeira vez ou quando a configuração mudar. A engine anterior é descartada.
+        """
         config, connection_string = self.load_db_config(db_type)
         if db_type == 'sqlite':
-            self.engine = create_engine(connection_string.format(database=config['database']))
+            url = connection_string.format(database=config['database'])
+            options = {'pool_pre_ping': True}
         else:
-            self.engine = create_engine(connection_string.format(**config))
-        self.current_db_type = db_type
+            url = connection_string.format(**config)
+            options = POOL_OPTIONS
+
+        with self._lock:
+            registered = self._engines.get(db_type)
+            if registered and registered[0] == url:
+                return registered[1]
+            if registered:
+                registered[1].dispose()
+            engine = create_engine(url, **options)
+            self._engines[db_type] = (url, engine)
+            self._metadata[db_type] = MetaData()
+            return engine
     
-    def load_table_data(self, table_name: str):
-        
-        """Carrega os dados de uma tabela do banco configurado."""
-        if not self.engine:
+    def configure_connection(self, db_type: str):
+        """Configura a conexão com o banco de dados."""
+        self.engine = self.get_engine(db_type)
+        self.current_db_type = db_type
+        return self.engine
+
+    def resolve_engine(self, db_type: str = None):
+        """
+        Engine do banco configurado na sessão da requisição. Sem `db_type`, não
+        usa a última engine configurada, que pode ser de outro usuário.
+        """
+        if not db_type:
             raise ValueError("Conexão com o banco de dados não configurada.")
+        return self.get_engine(db_type)
+
+    def pool_stats(self):
+        """Estatísticas de uso dos pools de conexão de cada engine registrada."""
+        stats = {}
+        with self._lock:
+            for db_type, (_, engine) in self._engines.items():
+                pool = engine.pool
+                stats[db_type] = {
+                    'pool_class': type(pool).__name__,
+                    'status': pool.status(),
+                    'size': pool.size() if hasattr(pool, 'size') else None,
+                    'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+                    'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+                    'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+                }
+        return stats
+
+    def dispose(self, db_type: str = None):
+        """Fecha as conexões do pool de um tipo de banco (ou de todos)."""
+        with self._lock:
+            db_types = [db_type] if db_type else list(self._engines)
+            for key in db_types:
+                registered = self._engines.pop(key, None)
+                self._metadata.pop(key, None)
+                if registered:
+                    registered[1].dispose()
+                if key == self.current_db_type:
+                    self.engine = None
+                    self.current_db_type = None
+    
+    def reflect_table(self, table_name: str, db_type: str = None, refresh: bool = False):
+        """
+        Retorna a engine e a tabela reflexionada. A reflexão é feita uma única vez
+        por engine e reaproveitada nas consultas seguintes (`refresh` força a releitura).
+        """
+        engine = self.resolve_engine(db_type)
         if not table_name:
             raise ValueError("Nome da tabela não fornecido.")
-        
-        df = pd.read_sql_table(table_name, con=self.engine)
-        print(df.head())
-        df = df.map(lambda x: None if isinstance(x, float) and np.isnan(x) else x)
-        for col in df.select_dtypes(include=['datetime64']):
-            df[col] = df[col].astype(str)
-        df = df.applymap(lambda x: list(x) if isinstance(x, set) else x)
-        return df.fillna("null").to_dict(orient='records')
+
+        with self._reflect_lock:
+            metadata = self._metadata.setdefault(db_type, MetaData())
+            if refresh and table_name in metadata.tables:
+                metadata.remove(metadata.tables[table_name])
+            if table_name in metadata.tables:
+                return engine, metadata.tables[table_name]
+            try:
+                return engine, Table(table_name, metadata, autoload_with=engine)
+            except NoSuchTableError:
+                raise ValueError(f"Tabela '{table_name}' não encontrada.")
+
+    def _table_select(self, table_name: str, columns=None, limit: int = None, db_type: str = None):
+        """Monta o SELECT da tabela com projeção de colunas e limite de linhas."""
+        engine, table = self.reflect_table(table_name, db_type)
+        if columns:
+            missing = [col for col in columns if col not in table.c]
+            if missing:
+                raise ValueError(f"Colunas não encontradas na tabela '{table_name}': {missing}")
+            stmt = select(*[table.c[col] for col in columns])
+        else:
+            stmt = select(table)
+        if limit is not None:
+            stmt = stmt.limit(int(limit))
+        return engine, table, stmt
+
+    def iter_table_chunks(self, table_name: str, columns=None, limit: int = None,
+                          chunksize: int = DEFAULT_CHUNKSIZE, db_type: str = None):
+        """
+        Lê a tabela em blocos de `chunksize` linhas usando cursor do lado do
+        servidor (`stream_results`), sem carregar a tabela inteira na memória.
+        """
+        engine, _, stmt = self._table_select(table_name, columns, limit, db_type)
+        return self._iter_statement_chunks(engine, stmt, chunksize)
+
+    def _iter_statement_chunks(self, engine, stmt, chunksize: int = DEFAULT_CHUNKSIZE):
+        """Executa o SELECT com cursor do lado do servidor e gera o resultado em blocos."""
+        output = list(stmt.selected_columns)
+        set_columns = [col.name for col in output if isinstance(col.type, SET)]
+        datetime_columns = [col.name for col in output if isinstance(col.type, (Date, DateTime))]
+
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+            # Só o tempo de leitura do cursor conta como consulta, não o consumo dos blocos
+            for chunk in timed_iter(pd.read_sql_query(stmt, conn, chunksize=chunksize), 'db_query'):
+                yield normalize_chunk(chunk, set_columns, datetime_columns)
+
+    def query_frame(self, table_name: str, query: dict, db_type: str = None,
+                    chunksize: int = DEFAULT_CHUNKSIZE, on_chunk=None) -> pd.DataFrame:
+        """
+        Executa uma consulta estruturada (filtros, colunas, ordenação, limite e
+        agregações) diretamente no banco e retorna apenas o resultado.
+        """
+        engine, table = self.reflect_table(table_name, db_type)
+        try:
+            stmt = build_query(table, **query)
+        except TypeError as e:
+            raise ValueError(f"Consulta inválida: {e}")
+        chunks = _collect_chunks(self._iter_statement_chunks(engine, stmt, chunksize), on_chunk)
+        if not chunks:
+            return pd.DataFrame(columns=[col.name for col in stmt.selected_columns])
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, ignore_index=True)
+
+    def stream_table_ndjson(self, table_name: str, columns=None, limit: int = None,
+                            chunksize: int = DEFAULT_CHUNKSIZE, db_type: str = None):
+        """Gera a tabela como NDJSON (um registro JSON por linha), bloco a bloco."""
+        for chunk in self.iter_table_chunks(table_name, columns, limit, chunksize, db_type):
+            if not chunk.empty:
+                lines = chunk.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+                yield lines if lines.endswith("\n") else lines + "\n"
+
+    def load_table_frame(self, table_name: str, columns=None, limit: int = None,
+                         chunksize: int = DEFAULT_CHUNKSIZE, db_type: str = None, on_chunk=None) -> pd.DataFrame:
+        """
+        Carrega uma tabela do banco configurado como DataFrame, lendo em blocos.
+        `on_chunk(linhas)` é chamado após cada bloco (progresso de jobs).
+        """
+        chunks = _collect_chunks(self.iter_table_chunks(table_name, columns, limit, chunksize, db_type), on_chunk)
+        if not chunks:
+            _, _, stmt = self._table_select(table_name, columns, limit, db_type)
+            return pd.DataFrame(columns=[col.name for col in stmt.selected_columns])
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, ignore_index=True)
+
+    def write_table(self, table_name: str, df: pd.DataFrame, if_exists: str = 'append',
+                    db_type: str = None, chunksize: int = DEFAULT_CHUNKSIZE):
+        """
+        Grava o DataFrame na tabela, em blocos, pelo caminho mais rápido do banco:
+        COPY no PostgreSQL, INSERT com várias linhas no MySQL e executemany nos
+        demais (SQLite). A tabela é criada se não existir. Retorna linhas e linhas/s.
+        """
+        if not table_name:
+            raise ValueError("Nome da tabela não fornecido.")
+        if if_exists not in ('append', 'replace', 'fail'):
+            raise ValueError("Opção 'if_exists' inválida. Use 'append', 'replace' ou 'fail'.")
+        engine = self.resolve_engine(db_type)
+
+        dialect = engine.dialect.name
+        if dialect == 'postgresql':
+            method, method_name = postgres_copy, 'copy'
+        elif dialect == 'mysql':
+            method, method_name = 'multi', 'multi'
+            chunksize = min(chunksize, MULTI_INSERT_ROWS)
+        else:
+            method, method_name = None, 'executemany'
+
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            df.to_sql(table_name, conn, if_exists=if_exists, index=False, chunksize=chunksize, method=method)
+        elapsed = time.perf_counter() - start
+        record_stage('db_write', elapsed)
+
+        # A estrutura da tabela pode ter mudado (criação ou 'replace')
+        self.reflect_table(table_name, db_type, refresh=True)
+        return {
+            'table_name': table_name,
+            'rows': len(df),
+            'method': method_name,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(len(df) / elapsed) if elapsed > 0 else None,
+        }
@@ -0,0 +1,276 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from history import OperationLog
+from schema import compact_frame
+from profiling import ProfileCache
+
+logger = logging.getLogger(__name__)
+
+# Tamanho padrão e máximo das janelas de linhas enviadas ao frontend
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 5000
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Retorna a memória ocupada pelo DataFrame (incluindo objetos Python)."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _column_nbytes(df: pd.DataFrame, column) -> int:
+    """Memória de uma coluna (0 se não existir)."""
+    if column not in df.columns:
+        return 0
+    return int(np.sum(df[column].memory_usage(deep=True, index=False)))
+
+
+class DatasetConflict(Exception):
+    """O dataset mudou depois de ser lido pela requisição (outra alteração terminou antes)."""
+
+
+class Dataset:
+    """DataFrame mantido no servidor, identificado por um ID e pertencente a uma sessão."""
+
+    def __init__(self, dataset_id: str, owner: str, df: pd.DataFrame, name: str = None,
+                 history_max_bytes: int = 256 * 1024 ** 2):
+        self.id = dataset_id
+        self.owner = owner
+        self.name = name
+        self.df = df
+        self.version = 0
+        self.nbytes = frame_nbytes(df)
+        # Memória contada no limite do armazenamento: tabela atual mais o histórico
+        self.accounted_bytes = self.nbytes
+        # Memória do DataFrame como foi lido, antes da redução dos tipos
+        self.loaded_nbytes = self.nbytes
+        # Ordenações e filtros já calculados para a versão atual
+        self.cache = {}
+        # Perfis das colunas, atualizados coluna a coluna conforme o histórico
+        self.profiles = ProfileCache()
+        self.history = OperationLog(f"Dados carregados: {name}" if name else "Dados carregados",
+                                    max_bytes=history_max_bytes)
+
+    def info(self):
+        return {
+            "dataset_id": self.id,
+            "name": self.name,
+            "version": self.version,
+            "columns": [str(col) for col in self.df.columns],
+            "row_count": len(self.df),
+            "memory_bytes": self.nbytes,
+            "loaded_memory_bytes": self.loaded_nbytes,
+        }
+
+
+class DatasetStore:
+    """
+    Armazena os DataFrames carregados por sessão, evitando que o navegador
+    precise reenviar a tabela inteira a cada transformação.
+
+    Os datasets são descartados por LRU quando o total (tabelas e históricos)
+    ultrapassa o limite de memória (`max_bytes`) ou a quantidade máxima de
+    datasets (`max_datasets`).
+    Com `compact_dtypes`, os tipos das colunas são reduzidos ao registrar o dataset.
+    """
+
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3, max_datasets: int = 32,
+                 history_max_bytes: int = 256 * 1024 ** 2, compact_dtypes: bool = True):
+        self.max_bytes = max_bytes
+        self.max_datasets = max_datasets
+        self.history_max_bytes = history_max_bytes
+        self.compact_dtypes = compact_dtypes
+        self._datasets = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    def add(self, owner: str, df: pd.DataFrame, name: str = None) -> Dataset:
+        """Registra um novo DataFrame e retorna o dataset criado."""
+        # As rotas recebem nomes de colunas como texto (JSON); rótulos inteiros do TXT viram '1', '2', ...
+        if not all(isinstance(col, str) for col in df.columns):
+            df = df.set_axis([str(col) for col in df.columns], axis=1)
+        memory = None
+        if self.compact_dtypes:
+            df, memory = compact_frame(df)
+        dataset = Dataset(uuid.uuid4().hex, owner, df, name, self.history_max_bytes)
+        if memory:
+            dataset.loaded_nbytes = memory["memory_before"]
+            logger.info("Dataset %s: %d -> %d bytes após ajuste dos tipos.", name or dataset.id,
+                        memory['memory_before'], memory['memory_after'])
+        with self._lock:
+            self._datasets[dataset.id] = dataset
+            self._total_bytes += dataset.accounted_bytes
+            self._evict(keep=dataset.id)
+        return dataset
+
+    def get(self, dataset_id: str, owner: str) -> Dataset:
+        """Retorna o dataset da sessão. Lança KeyError se não existir ou já tiver sido descartado."""
+        with self._lock:
+            dataset = self._datasets.get(dataset_id)
+            if dataset is None or dataset.owner != owner:
+                raise KeyError(dataset_id)
+            self._datasets.move_to_end(dataset_id)
+            return dataset
+
+    def update(self, dataset_id: str, owner: str, df: pd.DataFrame, operation=None,
+               expected_version: int = None) -> Dataset:
+        """
+        Substitui o DataFrame de um dataset existente, incrementando sua versão.
+        Quando informada, a operação é registrada no histórico para poder ser desfeita.
+        Com `expected_version` (a versão lida antes de calcular `df`), lança
+        DatasetConflict se outra alteração foi aplicada nesse meio tempo.
+        """
+        with self._lock:
+            dataset = self.get(dataset_id, owner)
+            if expected_version is not None and dataset.version != expected_version:
+                raise DatasetConflict(
+                    "O dataset foi alterado por outra requisição enquanto esta era processada. "
+                    "Recarregue os dados e tente novamente.")
+            if operation is not None:
+                dataset.history.record(operation)
+            return self._replace(dataset, df, operation)
+
+    def undo(self, dataset_id: str, owner: str) -> Dataset:
+        """Desfaz a última operação do dataset."""
+        with self._lock:
+            dataset = self.get(dataset_id, owner)
+            df, operation = dataset.history.undo(dataset.df)
+            return self._replace(dataset, df, operation, undone=True)
+
+    def redo(self, dataset_id: str, owner: str) -> Dataset:
+        """Refaz a última operação desfeita do dataset."""
+        with self._lock:
+            dataset = self.get(dataset_id, owner)
+            df, operation = dataset.history.redo(dataset.df)
+            return self._replace(dataset, df, operation)
+
+    def _replace(self, dataset: Dataset, df: pd.DataFrame, operation=None, undone: bool = False) -> Dataset:
+        dataset.nbytes = self._next_nbytes(dataset, df, operation, undone)
+        dataset.df = df
+        accounted = dataset.nbytes + dataset.history.nbytes
+        self._total_bytes += accounted - dataset.accounted_bytes
+        dataset.accounted_bytes = accounted
+        dataset.version += 1
+        dataset.cache.clear()
+        dataset.profiles.apply(dataset.version, operation, undone)
+        self._evict(keep=dataset.id)
+        return dataset
+
+    @staticmethod
+    def _next_nbytes(dataset: Dataset, df: pd.DataFrame, operation, undone: bool) -> int:
+        """
+        Memória da nova tabela, calculada pelo tamanho da alteração: apenas as
+        colunas da operação são medidas, e checkpoints já trazem os dois tamanhos.
+        """
+        if operation is None:
+            return frame_nbytes(df)
+        if operation.kind == 'checkpoint':
+            return operation.before_nbytes if undone else operation.after_nbytes
+        delta = sum(_column_nbytes(df, column) - _column_nbytes(dataset.df, column) for column in operation.columns)
+        return dataset.nbytes + delta
+
+    def remove(self, dataset_id: str, owner: str):
+        with self._lock:
+            dataset = self.get(dataset_id, owner)
+            del self._datasets[dataset_id]
+            self._total_bytes -= dataset.accounted_bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_datasets": self.max_datasets,
+            }
+
+    def _evict(self, keep: str = None):
+        """Descarta os datasets menos usados até respeitar os limites configurados."""
+        while self._datasets and (
+            self._total_bytes > self.max_bytes or len(self._datasets) > self.max_datasets
+        ):
+            oldest_id = next(iter(self._datasets))
+            if oldest_id == keep:
+                # O dataset recém-usado nunca é descartado, mesmo que sozinho exceda o limite
+                if len(self._datasets) == 1:
+                    break
+                self._datasets.move_to_end(oldest_id)
+                continue
+            evicted = self._datasets.pop(oldest_id)
+            self._total_bytes -= evicted.accounted_bytes
+            logger.info("Dataset %s descartado do armazenamento (LRU).", evicted.id)
+
+
+def _cached(dataset: Dataset, key, compute):
+    """Calcula um valor derivado do dataset uma única vez por versão."""
+    if key not in dataset.cache:
+        if len(dataset.cache) >= 16:
+            dataset.cache.clear()
+        dataset.cache[key] = compute()
+    return dataset.cache[key]
+
+
+def _sort_positions(df: pd.DataFrame, column, ascending: bool) -> np.ndarray:
+    """Posições das linhas ordenadas pela coluna (estável, nulos no final)."""
+    series = df[column].reset_index(drop=True)
+    try:
+        ordered = series.sort_values(ascending=ascending, kind='stable', na_position='last')
+    except TypeError:
+        # Colunas com tipos misturados são ordenadas pela representação textual
+        ordered = series.astype(str).sort_values(ascending=ascending, kind='stable')
+    return ordered.index.to_numpy()
+
+
+def _filter_mask(df: pd.DataFrame, search: str = None, filters: dict = None) -> np.ndarray:
+    """Máscara das linhas que contêm `search` em alguma coluna e atendem aos filtros exatos."""
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in (filters or {}).items():
+        if column not in df.columns:
+            raise ValueError(f"A coluna '{column}' não existe.")
+        mask &= (df[column].astype(str) == str(value)).to_numpy()
+    if search:
+        found = np.zeros(len(df), dtype=bool)
+        for column in df.columns:
+            series = df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Procura apenas nas categorias e expande pelos códigos
+                codes = series.cat.codes.to_numpy()
+                hits = series.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+                found |= (codes >= 0) & np.asarray(hits)[codes]
+                continue
+            found |= series.astype(str).str.contains(search, case=False, regex=False).to_numpy()
+        mask &= found
+    return mask
+
+
+def read_window(dataset: Dataset, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE,
+                sort=None, ascending: bool = True, search: str = None, filters: dict = None):
+    """
+    Retorna uma janela de linhas do dataset, opcionalmente filtrada e ordenada,
+    junto com a quantidade de linhas que atendem ao filtro.
+
+    O custo de cada chamada depende do tamanho da janela: ordenações e filtros
+    são calculados uma vez por versão do dataset e reaproveitados entre páginas.
+    """
+    df = dataset.df
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 0), MAX_PAGE_SIZE)
+    if sort is not None and sort not in df.columns:
+        raise ValueError(f"A coluna '{sort}' não existe.")
+
+    positions = None
+    if sort is not None:
+        positions = _cached(dataset, ('sort', sort, ascending),
+                            lambda: _sort_positions(df, sort, ascending))
+    if search or filters:
+        key = ('filter', search, tuple(sorted((str(k), str(v)) for k, v in (filters or {}).items())))
+        mask = _cached(dataset, key, lambda: _filter_mask(df, search, filters))
+        positions = np.flatnonzero(mask) if positions is None else positions[mask[positions]]
+
+    if positions is None:
+        return df.iloc[offset:offset + limit], len(df)
+    return df.iloc[positions[offset:offset + limit]], len(positions)
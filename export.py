@@ -0,0 +1,119 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from serialization import pa, arrow_schema, arrow_table
+
+if pa is not None:
+    import pyarrow.parquet as pq
+
+# Linhas serializadas por vez ao gerar o arquivo exportado
+EXPORT_CHUNKSIZE = 100000
+# Tamanho dos blocos enviados ao ler arquivos temporários
+READ_BUFFER_SIZE = 1024 * 1024
+# Limite de linhas de uma planilha do Excel (descontando o cabeçalho)
+XLSX_MAX_ROWS = 1048575
+
+# Formatos de exportação: tipo MIME e extensão do arquivo
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+}
+
+
+def _iter_slices(df: pd.DataFrame, chunksize: int):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def iter_csv(df: pd.DataFrame, chunksize: int = EXPORT_CHUNKSIZE):
+    """Gera o CSV em blocos de linhas; apenas um bloco é serializado por vez."""
+    yield df.head(0).to_csv(index=False).encode('utf-8')
+    for chunk in _iter_slices(df, chunksize):
+        yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+
+class _StreamSink:
+    """Destino de escrita do Parquet que acumula apenas os bytes ainda não enviados."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def iter_parquet(df: pd.DataFrame, chunksize: int = EXPORT_CHUNKSIZE):
+    """Gera o Parquet com um row group por bloco, enviando cada um assim que é escrito."""
+    if pa is None:
+        raise ValueError("Exportação em Parquet indisponível: instale o pyarrow.")
+    # O schema vem do frame inteiro: inferido no primeiro bloco, um bloco posterior com outro tipo
+    # (texto misturado, coluna só com nulos no início) falharia com o arquivo já parcialmente enviado
+    schema = arrow_schema(df)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _iter_slices(df, chunksize) if len(df) else [df]:
+            writer.write_table(arrow_table(chunk, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_xlsx(df: pd.DataFrame, chunksize: int = EXPORT_CHUNKSIZE):
+    """
+    Gera o XLSX. O formato é um ZIP que só pode ser fechado no final, então a
+    planilha é escrita em modo write-only (linhas gravadas direto em disco) e
+    o arquivo temporário é enviado em blocos.
+    """
+    from openpyxl import Workbook
+
+    if len(df) > XLSX_MAX_ROWS:
+        raise ValueError(f"O Excel suporta no máximo {XLSX_MAX_ROWS} linhas; use CSV ou Parquet.")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Dados')
+    sheet.append([str(col) for col in df.columns])
+    for chunk in _iter_slices(df, chunksize):
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(row)
+
+    fd, path = tempfile.mkstemp(prefix='gmaster_export_', suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            while block := f.read(READ_BUFFER_SIZE):
+                yield block
+    finally:
+        os.remove(path)
+
+
+def export_stream(df: pd.DataFrame, export_format: str):
+    """Retorna o gerador de bytes do formato pedido. Lança ValueError para formatos inválidos."""
+    writers = {'csv': iter_csv, 'parquet': iter_parquet, 'xlsx': iter_xlsx}
+    if export_format not in writers:
+        raise ValueError(f"Formato de exportação inválido. Opções válidas: {list(EXPORT_FORMATS)}")
+    return writers[export_format](df)
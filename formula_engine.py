@@ -0,0 +1,195 @@
+import ast
+import re
+import operator
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Operadores permitidos nas fórmulas
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: np.negative,
+}
+COMPARISON_OPERATORS = {
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+}
+
+# Funções permitidas: nome -> (função vetorizada, quantidade de argumentos aceita)
+FUNCTIONS = {
+    'abs': (np.abs, (1,)),
+    'sqrt': (np.sqrt, (1,)),
+    'log': (np.log, (1,)),
+    'log10': (np.log10, (1,)),
+    'exp': (np.exp, (1,)),
+    'floor': (np.floor, (1,)),
+    'ceil': (np.ceil, (1,)),
+    'round': (np.round, (1, 2)),
+    'min': (np.minimum, (2,)),
+    'max': (np.maximum, (2,)),
+    'pow': (np.power, (2,)),
+}
+
+_PLACEHOLDER = re.compile(r'^__c(\d+)$')
+# Marcadores digitados diretamente na fórmula (fora de uma referência a coluna)
+_RAW_PLACEHOLDER = re.compile(r'(?<![\w.])__c\d+(?!\w)')
+_PLACEHOLDER_REFERENCE = re.compile(r'__c(\d+)')
+
+
+@lru_cache(maxsize=64)
+def _column_pattern(columns: tuple):
+    """
+    Expressão regular que reconhece as referências a colunas: `[nome]` ou o nome
+    exato da coluna. Os nomes mais longos têm prioridade, então uma coluna que é
+    parte do nome de outra ("valor" e "valor_total") não é substituída por engano.
+    Nomes numéricos só são reconhecidos entre colchetes, para não serem confundidos com constantes.
+    """
+    names = sorted((col for col in columns if not _is_number(col)), key=len, reverse=True)
+    alternatives = [r'\[(?P<bracket>[^\]]+)\]']
+    if names:
+        alternatives.append(r'(?<![\w.])(?P<bare>' + '|'.join(re.escape(name) for name in names) + r')(?![\w])')
+    return re.compile('|'.join(alternatives))
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def resolve_columns(formula: str, columns):
+    """
+    Substitui as referências a colunas por marcadores (`__c0`, `__c1`, ...) na
+    ordem em que aparecem. Retorna a expressão normalizada e as colunas referenciadas.
+    """
+    columns = tuple(str(col) for col in columns)
+    known = set(columns)
+    referenced = []
+
+    def replace(match):
+        name = match.group('bracket') if match.group('bracket') is not None else match.group('bare')
+        if name in FUNCTIONS and match.group('bare') is not None and formula[match.end():].lstrip().startswith('('):
+            # Coluna com o mesmo nome de uma função sendo chamada: mantém a função
+            return name
+        if name not in known:
+            raise ValueError(f"A coluna '{name}' não existe.")
+        if name not in referenced:
+            referenced.append(name)
+        return f"__c{referenced.index(name)}"
+
+    pattern = _column_pattern(columns)
+    # Os marcadores são internos: um '__c0' fora das referências a colunas não pode chegar ao compilador
+    raw = _RAW_PLACEHOLDER.search(pattern.sub(' ', formula))
+    if raw:
+        raise ValueError(f"Coluna ou função desconhecida: '{raw.group()}'.")
+    normalized = pattern.sub(replace, formula)
+    return normalized, tuple(referenced)
+
+
+def _compile_node(node):
+    """Valida um nó da AST e o converte em uma função que recebe a lista de colunas (arrays)."""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        # Constantes em float64, como as colunas: inteiros não transbordam em silêncio (10**400 vira nulo, não 0)
+        try:
+            value = np.float64(node.value)
+        except OverflowError:
+            raise ValueError(f"Constante fora do intervalo numérico: {node.value}.")
+        return lambda cols: value
+
+    if isinstance(node, ast.Name):
+        match = _PLACEHOLDER.match(node.id)
+        if not match:
+            raise ValueError(f"Coluna ou função desconhecida: '{node.id}'.")
+        index = int(match.group(1))
+        return lambda cols: cols[index]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        func = BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda cols: func(left(cols), right(cols))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        func = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda cols: func(operand(cols))
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in COMPARISON_OPERATORS:
+        func = COMPARISON_OPERATORS[type(node.ops[0])]
+        left, right = _compile_node(node.left), _compile_node(node.comparators[0])
+        return lambda cols: func(left(cols), right(cols))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        if node.func.id not in FUNCTIONS:
+            raise ValueError(f"Função não permitida: '{node.func.id}'. Opções válidas: {list(FUNCTIONS)}")
+        func, arities = FUNCTIONS[node.func.id]
+        if len(node.args) not in arities:
+            raise ValueError(f"A função '{node.func.id}' recebe {' ou '.join(map(str, arities))} argumento(s).")
+        args = [_compile_node(arg) for arg in node.args]
+        if node.func.id == 'round' and len(args) == 2:
+            return lambda cols: func(args[0](cols), int(args[1](cols)))
+        return lambda cols: func(*[arg(cols) for arg in args])
+
+    raise ValueError(f"Expressão não permitida na fórmula: '{ast.unparse(node)}'.")
+
+
+@lru_cache(maxsize=256)
+def compile_formula(normalized: str):
+    """Compila a expressão normalizada (já com marcadores de coluna). O resultado é cacheado pelo texto."""
+    try:
+        tree = ast.parse(normalized.strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError("Fórmula com sintaxe inválida.")
+    return _compile_node(tree)
+
+
+def _numeric_values(series: pd.Series) -> np.ndarray:
+    """Valores numéricos da coluna como float; valores não numéricos viram NaN."""
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors='coerce')
+    return series.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def evaluate_formula(df: pd.DataFrame, formula: str) -> pd.Series:
+    """
+    Avalia a fórmula sobre o DataFrame de forma vetorizada, sem usar `eval`.
+
+    As colunas podem ser referenciadas pelo nome exato ou entre colchetes
+    (`[valor total] * 2`). Apenas operadores aritméticos, comparações e as
+    funções de FUNCTIONS são aceitos; apenas as colunas usadas são convertidas para número.
+    """
+    normalized, referenced = resolve_columns(formula, df.columns)
+    try:
+        evaluate = compile_formula(normalized)
+    except ValueError as e:
+        # As mensagens citam a expressão normalizada; os marcadores voltam a ser os nomes das colunas
+        raise ValueError(_PLACEHOLDER_REFERENCE.sub(lambda m: f"[{referenced[int(m.group(1))]}]", str(e)))
+    lookup = {str(col): col for col in df.columns}
+    values = [_numeric_values(df[lookup[name]]) for name in referenced]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        result = evaluate(values)
+    if np.ndim(result) == 0:
+        result = np.full(len(df), result)
+    if result.dtype.kind == 'f':
+        # Divisões por zero resultam em nulo, que é serializável em JSON (ao contrário de inf)
+        result = np.where(np.isinf(result), np.nan, result)
+    return pd.Series(result, index=df.index)
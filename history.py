@@ -0,0 +1,148 @@
+import threading
+
+import pandas as pd
+
+
+class Operation:
+    """
+    Entrada do histórico de um dataset. Guarda apenas o necessário para
+    desfazer e refazer a operação:
+
+    - 'rename': os nomes antigo e novo da coluna (custo constante);
+    - 'column': a coluna antes e depois da alteração (`before` é None quando a
+      coluna foi criada), sem copiar o restante da tabela;
+    - 'checkpoint': referências para a tabela antes e depois, para operações
+      sem inversa barata (transpor, limpar dados).
+
+    `before_nbytes` e `after_nbytes` são a memória de cada lado da operação;
+    o lado que é a tabela atual não conta no histórico (ver `OperationLog.nbytes`).
+    """
+
+    def __init__(self, label: str, kind: str, params: dict, before_nbytes: int = 0, after_nbytes: int = 0):
+        self.label = label
+        self.kind = kind
+        self.params = params
+        self.before_nbytes = before_nbytes
+        self.after_nbytes = after_nbytes
+
+    @property
+    def columns(self):
+        """Colunas alteradas pela operação (None quando a tabela inteira mudou)."""
+        if self.kind == 'rename':
+            return [self.params['old'], self.params['new']]
+        if self.kind == 'column':
+            return [self.params['column']]
+        return None
+
+    def undo(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.kind == 'rename':
+            return df.rename(columns={self.params['new']: self.params['old']})
+        if self.kind == 'column':
+            column, before = self.params['column'], self.params['before']
+            if before is None:
+                return df.drop(columns=[column])
+            return _set_column(df, column, before)
+        return self.params['before']
+
+    def redo(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.kind == 'rename':
+            return df.rename(columns={self.params['old']: self.params['new']})
+        if self.kind == 'column':
+            return _set_column(df, self.params['column'], self.params['after'])
+        return self.params['after']
+
+
+def _set_column(df: pd.DataFrame, column, values: pd.Series) -> pd.DataFrame:
+    updated = df.copy(deep=False)
+    updated[column] = values
+    return updated
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _series_nbytes(series) -> int:
+    return 0 if series is None else int(series.memory_usage(deep=True, index=False))
+
+
+def rename_operation(old, new) -> Operation:
+    return Operation(f"Renomeou coluna '{old}' para '{new}'", 'rename', {'old': old, 'new': new})
+
+
+def column_operation(label: str, column, before: pd.Series, after: pd.Series) -> Operation:
+    """Operação que altera (ou cria, quando `before` é None) uma única coluna."""
+    return Operation(label, 'column', {'column': column, 'before': before, 'after': after},
+                     _series_nbytes(before), _series_nbytes(after))
+
+
+def checkpoint_operation(label: str, before: pd.DataFrame, after: pd.DataFrame, before_nbytes: int = None) -> Operation:
+    """Operação que substitui a tabela inteira; guarda as duas versões."""
+    if before_nbytes is None:
+        before_nbytes = _frame_nbytes(before)
+    # Os tamanhos ficam guardados para que desfazer/refazer não precise medir a tabela de novo
+    return Operation(label, 'checkpoint', {'before': before, 'after': after}, before_nbytes, _frame_nbytes(after))
+
+
+class OperationLog:
+    """
+    Histórico de operações de um dataset, com desfazer/refazer. O custo de cada
+    passo é o tamanho da alteração, não o da tabela. Quando a memória das
+    entradas passa de `max_bytes`, as operações mais antigas deixam de poder ser desfeitas.
+    """
+
+    def __init__(self, base_label: str = "Dados carregados", max_bytes: int = 256 * 1024 ** 2):
+        self.base_label = base_label
+        self.max_bytes = max_bytes
+        self._entries = []
+        # Quantidade de entradas aplicadas; as seguintes podem ser refeitas
+        self._position = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memória guardada apenas pelo histórico. O lado de cada entrada que
+        coincide com a tabela atual (ou com a entrada vizinha) já é contado lá:
+        das entradas aplicadas conta o estado anterior; das desfeitas, o posterior.
+        """
+        applied, undone = self._entries[:self._position], self._entries[self._position:]
+        return sum(entry.before_nbytes for entry in applied) + sum(entry.after_nbytes for entry in undone)
+
+    def record(self, operation: Operation):
+        with self._lock:
+            # Uma nova operação descarta o que havia sido desfeito
+            del self._entries[self._position:]
+            self._entries.append(operation)
+            self._position = len(self._entries)
+            while len(self._entries) > 1 and self.nbytes > self.max_bytes:
+                self._entries.pop(0)
+                self._position -= 1
+
+    def undo(self, df: pd.DataFrame):
+        """Desfaz a última operação aplicada. Retorna (DataFrame, operação)."""
+        with self._lock:
+            if self._position == 0:
+                raise ValueError("Nenhuma operação para desfazer")
+            self._position -= 1
+            operation = self._entries[self._position]
+            return operation.undo(df), operation
+
+    def redo(self, df: pd.DataFrame):
+        """Refaz a última operação desfeita. Retorna (DataFrame, operação)."""
+        with self._lock:
+            if self._position == len(self._entries):
+                raise ValueError("Nenhuma operação para refazer")
+            operation = self._entries[self._position]
+            self._position += 1
+            return operation.redo(df), operation
+
+    def to_list(self):
+        """Histórico no formato usado pelo frontend (`fetchHistory`)."""
+        with self._lock:
+            items = [{"operation": self.base_label, "undone": False}]
+            items.extend(
+                {"operation": entry.label, "undone": index >= self._position}
+                for index, entry in enumerate(self._entries)
+            )
+            return items
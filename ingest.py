@@ -0,0 +1,456 @@
+import logging
+import os
+import csv
+import json
+import codecs
+import shutil
+import zipfile
+import tempfile
+import xml.etree.ElementTree as ET
+from io import BytesIO
+from contextlib import contextmanager
+
+import chardet
+import pandas as pd
+
+import workers
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos blocos copiados ao gravar o upload em disco
+SPOOL_BUFFER_SIZE = 1024 * 1024
+# Quantidade de bytes usada para detectar codificação e delimitador
+SAMPLE_SIZE = 64 * 1024
+# Linhas lidas por vez pelo parser de CSV
+CSV_CHUNKSIZE = 100000
+# Codificações tentadas quando um trecho do CSV não decodifica com a detectada na amostra
+FALLBACK_ENCODINGS = ('cp1252', 'latin-1')
+# Tipos de arquivo aceitos dentro de um ZIP
+ZIP_MEMBER_TYPES = ('.csv', '.xlsx', '.json', '.xml')
+
+def spool_to_tempfile(file_storage, suffix: str = '', hasher=None) -> str:
+    """
+    Grava o arquivo enviado em um arquivo temporário, em blocos, sem ler o
+    conteúdo inteiro para a memória. Quem chama é responsável por removê-lo.
+    Se `hasher` (um objeto do hashlib) for informado, é atualizado com cada
+    bloco, calculando a impressão digital do conteúdo durante a gravação.
+    """
+    fd, path = tempfile.mkstemp(prefix='gmaster_upload_', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            if hasher is None:
+                shutil.copyfileobj(file_storage.stream, target, SPOOL_BUFFER_SIZE)
+            else:
+                while block := file_storage.stream.read(SPOOL_BUFFER_SIZE):
+                    hasher.update(block)
+                    target.write(block)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+@contextmanager
+def spooled_upload(file_storage, suffix: str = '', hasher=None):
+    """Como `spool_to_tempfile`, removendo o arquivo temporário ao sair do bloco `with`."""
+    path = spool_to_tempfile(file_storage, suffix, hasher)
+    try:
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_sample(source, size: int = SAMPLE_SIZE) -> bytes:
+    """Lê o início de um caminho ou de um arquivo binário (que volta para o início)."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read(size)
+    sample = source.read(size)
+    source.seek(0)
+    return sample
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Detecta a codificação a partir de uma amostra do arquivo."""
+    try:
+        # Caminho rápido: a maioria dos arquivos é UTF-8 (o último caractere pode estar cortado na amostra)
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3 and len(sample) >= SAMPLE_SIZE:
+            return 'utf-8'
+    return chardet.detect(sample)['encoding'] or 'utf-8'
+
+
+def sniff_delimiter(text: str, default: str = ',') -> str:
+    """Identifica o delimitador do CSV a partir das primeiras linhas."""
+    # Descarta a última linha, que pode estar incompleta na amostra
+    lines = text.splitlines()[:-1] or text.splitlines()
+    try:
+        return csv.Sniffer().sniff('\n'.join(lines[:200]), delimiters=',;\t|').delimiter
+    except csv.Error:
+        return default
+
+
+def iter_csv_chunks(source, sep: str = None, chunksize: int = CSV_CHUNKSIZE, encoding: str = None, **options):
+    """
+    Lê o CSV em blocos com o parser em C. A codificação (se não informada) e o
+    delimitador são detectados apenas em uma amostra do início do arquivo,
+    evitando `sep=None` (que força o parser em Python, bem mais lento).
+    A decodificação é estrita: um trecho posterior em outra codificação gera UnicodeDecodeError.
+    """
+    sample = read_sample(source)
+    if encoding is None:
+        encoding = detect_encoding(sample)
+        logger.debug("Codificação detectada: %s", encoding)
+    if sep is None:
+        sep = sniff_delimiter(sample.decode(encoding, errors='replace'))
+
+    options = {'on_bad_lines': 'skip', 'quotechar': '"', 'skipinitialspace': True, **options}
+    reader = pd.read_csv(source, sep=sep, encoding=encoding, engine='c', chunksize=chunksize, **options)
+    with reader:
+        yield from reader
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """Valores como texto; floats inteiros (inteiros com nulos no bloco) voltam ao texto original ('1', não '1.0')."""
+    if pd.api.types.is_float_dtype(series):
+        values = series.map(lambda value: str(int(value)) if value.is_integer() else str(value), na_action='ignore')
+    else:
+        values = series.map(str, na_action='ignore')
+    return values.astype('str')
+
+
+def _unify_chunk_dtypes(chunks):
+    """
+    Cada bloco infere os próprios tipos: uma coluna numérica nos primeiros
+    blocos e texto nos seguintes resultaria em uma coluna com int e str
+    misturados. Nesses casos a coluna vira texto em todos os blocos, como na
+    leitura do arquivo inteiro. Int e float juntos continuam numéricos.
+    """
+    columns = dict.fromkeys(col for chunk in chunks for col in chunk.columns)
+    for col in columns:
+        dtypes = {chunk[col].dtype for chunk in chunks if col in chunk.columns}
+        if len(dtypes) == 1 or all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                                   for dtype in dtypes):
+            continue
+        for chunk in chunks:
+            if col in chunk.columns:
+                chunk[col] = _as_text(chunk[col])
+    return chunks
+
+
+def _concat_chunks(chunks, on_chunk=None) -> pd.DataFrame:
+    """Junta os blocos lidos; `on_chunk(linhas)` é chamado após cada bloco (progresso/cancelamento)."""
+    collected = []
+    for chunk in chunks:
+        collected.append(chunk)
+        if on_chunk:
+            on_chunk(len(chunk))
+    chunks = collected
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(_unify_chunk_dtypes(chunks), ignore_index=True)
+
+
+def _read_csv_chunks(source, on_chunk=None, **options) -> pd.DataFrame:
+    """
+    Lê o CSV inteiro em blocos. Se um trecho depois da amostra não decodifica
+    com a codificação detectada (acentos em Latin-1 depois de 64 KB só em
+    ASCII), a leitura recomeça com as codificações de FALLBACK_ENCODINGS em
+    vez de trocar os caracteres por '\ufffd'.
+    """
+    detected = codecs.lookup(detect_encoding(read_sample(source))).name
+    encodings = list(dict.fromkeys([detected, *(codecs.lookup(name).name for name in FALLBACK_ENCODINGS)]))
+    for index, encoding in enumerate(encodings):
+        try:
+            return _concat_chunks(iter_csv_chunks(source, encoding=encoding, **options), on_chunk)
+        except UnicodeDecodeError as e:
+            if index == len(encodings) - 1:
+                raise
+            logger.warning("Arquivo não decodifica como %s (%s); lendo novamente como %s.", encoding, e, encodings[index + 1])
+            if not isinstance(source, (str, os.PathLike)):
+                source.seek(0)
+
+
+def read_csv_file(source, on_chunk=None) -> pd.DataFrame:
+    """Lê um arquivo CSV (caminho em disco ou arquivo binário)."""
+    try:
+        return _read_csv_chunks(source, on_chunk)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+
+def read_txt_file(path: str, on_chunk=None) -> pd.DataFrame:
+    """Lê um arquivo TXT delimitado por '|' com delimitadores extras no início e no fim de cada linha."""
+    df = _read_csv_chunks(path, on_chunk, sep='|', header=None, on_bad_lines='error', skipinitialspace=False)
+    # Remove as colunas vazias (delimitadores extras no início e fim)
+    return df.iloc[:, 1:-1]
+
+
+def _excel_engine():
+    """Usa o calamine (Rust) quando instalado; senão, o openpyxl em modo somente leitura."""
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return None
+
+
+def read_xlsx_sheet(source, sheet=0) -> pd.DataFrame:
+    """
+    Lê uma planilha (nome ou posição). Sem o calamine, as linhas são lidas em
+    modo streaming do openpyxl (read_only, apenas valores), sem a camada de
+    conversão célula a célula do `pd.read_excel`.
+    """
+    if _excel_engine() == 'calamine':
+        return pd.read_excel(source, sheet_name=sheet, engine='calamine')
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet, int):
+            worksheet = workbook.worksheets[sheet]
+        elif sheet in workbook.sheetnames:
+            worksheet = workbook[sheet]
+        else:
+            raise ValueError(f"Planilha '{sheet}' não encontrada. Planilhas: {workbook.sheetnames}")
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = _dedup_columns([f"Unnamed: {index}" if name is None else name for index, name in enumerate(header)])
+        return pd.DataFrame(list(rows), columns=columns)
+    finally:
+        workbook.close()
+
+
+def _dedup_columns(names):
+    """Renomeia cabeçalhos repetidos como o `read_excel`: 'a', 'a.1', 'a.2'..."""
+    counts = {}
+    result = []
+    for name in names:
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        result.append(name)
+        counts[name] = count + 1
+    return result
+
+
+def xlsx_sheet_names(path: str):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def read_xlsx_file(path: str, sheets=None) -> pd.DataFrame:
+    """
+    Lê a primeira planilha ou as planilhas indicadas (lista de nomes ou '*' para
+    todas). Várias planilhas são lidas em paralelo, cada uma em um processo, e
+    concatenadas com a coluna 'planilha' indicando a origem de cada linha.
+    """
+    if not sheets:
+        return read_xlsx_sheet(path)
+    names = xlsx_sheet_names(path)
+    selected = names if sheets == '*' else list(sheets)
+    missing = [name for name in selected if name not in names]
+    if missing:
+        raise ValueError(f"Planilhas não encontradas: {missing}. Planilhas: {names}")
+    if len(selected) == 1:
+        return read_xlsx_sheet(path, selected[0])
+
+    futures = [workers.submit(read_xlsx_sheet, path, name) for name in selected]
+    try:
+        frames = [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+    for name, frame in zip(selected, frames):
+        frame.insert(0, 'planilha', name, allow_duplicates=True)
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
+def read_json_file(source) -> pd.DataFrame:
+    """Lê um JSON no formato lista de objetos."""
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                data = json.load(f)
+        else:
+            data = json.load(source)
+    except json.JSONDecodeError as e:
+        logger.warning("Erro de decodificação JSON: %s", e)
+        raise ValueError("Erro ao decodificar o arquivo JSON.")
+    if not (isinstance(data, list) and all(isinstance(item, dict) for item in data)):
+        logger.warning("Estrutura de JSON inesperada. Esperado: lista de dicionários.")
+        raise ValueError("Formato de JSON inválido. Esperado uma lista de objetos.")
+    return pd.DataFrame(data)
+
+
+def _local_name(tag: str) -> str:
+    """Remove o namespace ('{uri}nome' vira 'nome')."""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else tag
+
+
+def iter_xml_chunks(source, chunksize: int = CSV_CHUNKSIZE):
+    """
+    Lê o XML com `iterparse`, sem montar a árvore inteira: cada filho da raiz
+    é um registro (atributos e subelementos viram colunas, como no `pd.read_xml`).
+    Os elementos são descartados assim que lidos, mantendo a memória constante.
+    """
+    records = []
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        record = {_local_name(key): value for key, value in elem.attrib.items()}
+        for child in elem:
+            record[_local_name(child.tag)] = child.text.strip() if child.text and child.text.strip() else None
+        if not record and elem.text and elem.text.strip():
+            record[_local_name(elem.tag)] = elem.text.strip()
+        records.append(record)
+        # Libera o registro já processado (e a referência a ele mantida pela raiz)
+        elem.clear()
+        root.clear()
+        if len(records) >= chunksize:
+            yield pd.DataFrame(records)
+            records = []
+    if records:
+        yield pd.DataFrame(records)
+
+
+def _infer_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte para número as colunas de texto cujos valores são todos numéricos."""
+    for col in df.columns:
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except (ValueError, TypeError):
+                pass
+    return df
+
+
+def read_xml_file(source, on_chunk=None) -> pd.DataFrame:
+    """Lê um XML (caminho ou arquivo binário) em blocos de registros, com `iterparse`."""
+    try:
+        return _infer_text_columns(_concat_chunks(iter_xml_chunks(source), on_chunk))
+    except ET.ParseError as e:
+        logger.warning("Erro ao processar o arquivo XML: %s", e)
+        return pd.DataFrame()
+
+
+# Extensões aceitas no upload
+UPLOAD_TYPES = ('.zip', '.xlsx', '.json', '.xml', '.csv', '.txt')
+
+
+def upload_extension(filename: str) -> str:
+    """Extensão do arquivo enviado, ou None se o tipo não for suportado."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    return extension if extension in UPLOAD_TYPES else None
+
+
+def read_upload_file(path: str, filename: str, on_chunk=None, sheets=None) -> pd.DataFrame:
+    """
+    Lê um upload já gravado em disco de acordo com a extensão do nome original.
+    Para CSV, TXT e XML, `on_chunk(linhas)` é chamado a cada bloco lido.
+    `sheets` seleciona as planilhas de um XLSX (lista de nomes ou '*').
+    """
+    extension = upload_extension(filename)
+    logger.debug("Tentando ler o arquivo %s...", extension[1:].upper() if extension else filename)
+    if extension == '.zip':
+        # Os arquivos são lidos direto do ZIP, em paralelo, sem extração para um diretório compartilhado
+        df = read_zip_file(path)
+    elif extension == '.xlsx':
+        df = read_xlsx_file(path, sheets)
+    elif extension == '.json':
+        df = read_json_file(path)
+    elif extension == '.xml':
+        df = read_xml_file(path, on_chunk)
+    elif extension == '.csv':
+        df = read_csv_file(path, on_chunk)
+    elif extension == '.txt':
+        try:
+            df = read_txt_file(path, on_chunk)
+        except Exception as e:
+            logger.warning("Erro ao processar o arquivo TXT: %s", e)
+            raise ValueError(f"Erro ao processar o arquivo TXT: {str(e)}")
+    else:
+        raise ValueError("File type not supported")
+    if on_chunk and extension not in ('.csv', '.txt', '.xml'):
+        on_chunk(len(df))
+    logger.info("Arquivo %s lido com sucesso.", filename)
+    return df
+
+
+def _read_zip_member(zip_path: str, member: str) -> pd.DataFrame:
+    """Lê um arquivo de dentro do ZIP direto do arquivo compactado (executado em um processo do pool)."""
+    with zipfile.ZipFile(zip_path) as archive, archive.open(member) as f:
+        name = member.lower()
+        if name.endswith('.csv'):
+            return read_csv_file(f)
+
+        if name.endswith('.xlsx'):
+            # O XLSX precisa de acesso aleatório, mais barato em memória do que no membro compactado
+            return read_xlsx_sheet(BytesIO(f.read()))
+
+        if name.endswith('.json'):
+            try:
+                return read_json_file(f)
+            except ValueError as e:
+                raise ValueError(f"{e} (arquivo {member})")
+
+        if name.endswith('.xml'):
+            return read_xml_file(f)
+
+    raise ValueError(f"Tipo de arquivo {member} não suportado dentro do ZIP.")
+
+
+def zip_members(zip_path: str):
+    """Arquivos de dados dentro do ZIP, ignorando diretórios e metadados do macOS."""
+    with zipfile.ZipFile(zip_path) as archive:
+        return [
+            info.filename for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('.')
+        ]
+
+
+def read_zip_file(zip_path: str) -> pd.DataFrame:
+    """
+    Lê todos os arquivos de um ZIP, cada um em um processo do pool, sem extraí-los
+    para disco. Os DataFrames são concatenados alinhando as colunas pelo nome.
+    """
+    members = zip_members(zip_path)
+    if not members:
+        return pd.DataFrame()
+    for member in members:
+        if not member.lower().endswith(ZIP_MEMBER_TYPES):
+            raise ValueError(f"Tipo de arquivo {member} não suportado dentro do ZIP.")
+    if len(members) == 1:
+        frames = [_read_zip_member(zip_path, members[0])]
+    else:
+        futures = [workers.submit(_read_zip_member, zip_path, member) for member in members]
+        try:
+            frames = [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+    for member, frame in zip(members, frames):
+        logger.info("Arquivo %s lido do ZIP: %d linhas.", member, len(frame))
+    return pd.concat(frames, ignore_index=True, sort=False)
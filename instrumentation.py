@@ -0,0 +1,398 @@
+import os
+import sys
+import time
+import uuid
+import functools
+import resource
+import threading
+import tracemalloc
+from collections import deque, Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.wrappers import Request
+
+# Limites (segundos) dos histogramas de duração
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# O profiler por requisição só é aceito quando habilitado no servidor
+PROFILING_ENABLED = os.getenv('GMASTER_PROFILING_ENABLED', '0') == '1'
+# Intervalo de amostragem do profiler e quantidade de perfis mantidos para consulta
+PROFILE_INTERVAL = float(os.getenv('GMASTER_PROFILE_INTERVAL_MS', '5')) / 1000
+MAX_PROFILES = 20
+# Intervalo de amostragem da memória residente durante as requisições
+RSS_SAMPLE_INTERVAL = float(os.getenv('GMASTER_RSS_SAMPLE_MS', '10')) / 1000
+
+# Rótulo usado para medições fora de uma requisição (jobs em segundo plano)
+BACKGROUND_ROUTE = 'background'
+
+
+def _label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """
+    Contadores, gauges e histogramas em memória, exportados no formato texto do
+    Prometheus. As séries são identificadas por (nome, rótulos ordenados).
+    """
+
+    def __init__(self):
+        self._help = {}
+        self._types = {}
+        self._values = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._types[name] = kind
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._values[(name, tuple(sorted(labels.items())))] = value
+
+    def set_max(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = max(self._values.get(key, value), value)
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total = self._histograms.get(key, ([0] * len(LATENCY_BUCKETS), [0.0, 0]))
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[index] += 1
+            total[0] += value
+            total[1] += 1
+            self._histograms[key] = (buckets, total)
+
+    def render(self, extra_gauges=None) -> str:
+        """Texto no formato de exposição do Prometheus. `extra_gauges`: [(nome, ajuda, {rótulos}, valor)]."""
+        lines = []
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: (list(b), list(t)) for key, (b, t) in self._histograms.items()}
+        for name, help_text, labels, value in extra_gauges or []:
+            self.describe(name, 'gauge', help_text)
+            values[(name, tuple(sorted(labels.items())))] = value
+
+        names = sorted({name for name, _ in values} | {name for name, _ in histograms})
+        for name in names:
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+            for (series, labels), value in sorted(values.items()):
+                if series == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (series, labels), (buckets, (total, count)) in sorted(histograms.items()):
+                if series != name:
+                    continue
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('gmaster_requests_total', 'counter', 'Requisições atendidas por rota, método e status.')
+metrics.describe('gmaster_request_seconds', 'histogram', 'Duração total das requisições por rota.')
+metrics.describe('gmaster_stage_seconds', 'histogram',
+                 'Duração das etapas (decode, build, compute, serialize, db_query, db_write) por rota.')
+metrics.describe('gmaster_rows_total', 'counter', 'Linhas lidas (build) e enviadas (serialize) por rota.')
+metrics.describe('gmaster_response_bytes_total', 'counter', 'Bytes enviados nas respostas por rota.')
+metrics.describe('gmaster_request_rss_growth_bytes_max', 'gauge',
+                 'Maior pico de memória residente (RSS) do processo acima do início de uma requisição da rota, '
+                 'incluindo a geração de respostas em stream.')
+
+
+def current_route() -> str:
+    if has_request_context():
+        return getattr(g, 'metrics_route', None) or (request.url_rule.rule if request.url_rule else 'unmatched')
+    return BACKGROUND_ROUTE
+
+
+@contextmanager
+def stage(name: str):
+    """Mede um trecho do processamento como uma etapa da requisição atual (ou de 'background')."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name: str, seconds: float):
+    if has_request_context() and hasattr(g, 'metrics_stages'):
+        # Somado na requisição e observado uma vez, quando a resposta termina
+        g.metrics_stages[name] += seconds
+    else:
+        metrics.observe('gmaster_stage_seconds', seconds, route=current_route(), stage=name)
+
+
+def timed_iter(iterable, name: str):
+    """Gera os itens medindo apenas o tempo gasto para produzir cada um (ex.: leitura do cursor do banco)."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record_stage(name, time.perf_counter() - start)
+            return
+        record_stage(name, time.perf_counter() - start)
+        yield item
+
+
+def count_rows(kind: str, rows: int):
+    """Conta linhas lidas ('build') ou enviadas ('serialize') pela rota atual."""
+    metrics.inc('gmaster_rows_total', rows, route=current_route(), kind=kind)
+
+
+class InstrumentedRequest(Request):
+    """Request que mede a decodificação do JSON do corpo como a etapa 'decode'."""
+
+    def get_json(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().get_json(*args, **kwargs)
+        finally:
+            record_stage('decode', time.perf_counter() - start)
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem: uma thread lê a pilha da thread da requisição a
+    cada intervalo e conta as pilhas no formato "collapsed" (uma linha por
+    pilha, pronta para flamegraph). Não instrumenta chamadas, então o custo é baixo.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='gmaster-profiler')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+
+# Perfis das últimas requisições perfiladas: {id: texto}
+profiles = {}
+_profile_order = deque()
+_profile_lock = threading.Lock()
+
+
+def _store_profile(profile_id: str, text: str):
+    with _profile_lock:
+        profiles[profile_id] = text
+        _profile_order.append(profile_id)
+        while len(_profile_order) > MAX_PROFILES:
+            profiles.pop(_profile_order.popleft(), None)
+
+
+def _profile_requested() -> bool:
+    return PROFILING_ENABLED and (request.args.get('_profile') == '1' or request.headers.get('X-Gmaster-Profile') == '1')
+
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _current_rss() -> int:
+    """Memória residente atual do processo, em bytes (sem /proc, usa o pico do processo)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RssMonitor:
+    """
+    Amostra a memória residente em uma thread enquanto houver medições
+    abertas, guardando em cada uma o maior valor visto. O RSS é do processo,
+    então uma única thread atende todas as requisições em andamento.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            rss = _current_rss()
+            with self._lock:
+                for measurement in self._active:
+                    measurement[1] = max(measurement[1], rss)
+                if not self._active:
+                    self._wake.clear()
+            time.sleep(self.interval)
+
+    def begin(self) -> list:
+        """Abre uma medição: [RSS no início, pico]."""
+        rss = _current_rss()
+        measurement = [rss, rss]
+        with self._lock:
+            self._active.append(measurement)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='gmaster-rss')
+                self._thread.start()
+            self._wake.set()
+        return measurement
+
+    def end(self, measurement: list) -> int:
+        """Fecha a medição e retorna o aumento do pico sobre o início, em bytes."""
+        rss = _current_rss()
+        with self._lock:
+            self._active.remove(measurement)
+        return max(measurement[1], rss) - measurement[0]
+
+
+rss_monitor = RssMonitor()
+
+
+# O tracemalloc é global do processo: fica ligado enquanto houver alguma requisição perfilada
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def _measure_stream(iterable, route: str, stages: Counter):
+    """Conta os bytes da resposta em stream e soma o tempo de geração de cada bloco à etapa 'serialize'."""
+    total = 0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                stages['serialize'] += time.perf_counter() - start
+            total += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+        metrics.inc('gmaster_response_bytes_total', total, route=route)
+
+
+def _finish_request(route: str, method: str, status: int, start: float, stages: Counter, measurement: list):
+    """Registra a requisição quando a resposta termina (depois do corpo, nas respostas em stream)."""
+    metrics.inc('gmaster_requests_total', route=route, method=method, status=status)
+    metrics.observe('gmaster_request_seconds', time.perf_counter() - start, route=route)
+    for name, seconds in stages.items():
+        metrics.observe('gmaster_stage_seconds', seconds, route=route, stage=name)
+    metrics.set_max('gmaster_request_rss_growth_bytes_max', max(rss_monitor.end(measurement), 0), route=route)
+
+
+def instrument_app(app):
+    """Registra a medição por requisição: etapas, linhas, bytes, memória e profiler opcional."""
+    app.request_class = InstrumentedRequest
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.metrics_start = time.perf_counter()
+        g.metrics_stages = Counter()
+        g.metrics_rss = rss_monitor.begin()
+        g.metrics_profiler = None
+        if _profile_requested():
+            _start_tracemalloc()
+            g.metrics_traced_start = tracemalloc.get_traced_memory()[0]
+            g.metrics_profiler = SamplingProfiler(threading.get_ident())
+            g.metrics_profiler.start()
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        if not hasattr(g, 'metrics_start'):
+            return response
+        route = g.metrics_route
+        elapsed = time.perf_counter() - g.metrics_start
+
+        if response.is_streamed:
+            response.response = _measure_stream(response.response, route, g.metrics_stages)
+        else:
+            metrics.inc('gmaster_response_bytes_total', response.calculate_content_length() or 0, route=route)
+        # Duração, etapas e pico de memória são fechados só quando o corpo termina de ser enviado
+        response.call_on_close(functools.partial(
+            _finish_request, route, request.method, response.status_code,
+            g.metrics_start, g.metrics_stages, g.metrics_rss))
+        g.metrics_rss = None
+
+        # As etapas aparecem também nas ferramentas de desenvolvedor do navegador
+        timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in g.metrics_stages.items()]
+        response.headers['Server-Timing'] = ', '.join(timings + [f"total;dur={elapsed * 1000:.1f}"])
+
+        if g.metrics_profiler is not None:
+            text = g.metrics_profiler.stop()
+            # Pico acima da memória rastreada no início; com requisições simultâneas, inclui as alocações delas
+            _, peak = tracemalloc.get_traced_memory()
+            _stop_tracemalloc()
+            growth = max(peak - g.metrics_traced_start, 0)
+            profile_id = uuid.uuid4().hex
+            _store_profile(profile_id, f"# rota {route}, {elapsed:.3f} s, pico Python +{growth} bytes\n" + text)
+            response.headers['X-Gmaster-Profile-Id'] = profile_id
+            g.metrics_profiler = None
+        return response
+
+    @app.teardown_request
+    def _stop_profiler(exc):
+        # Requisições interrompidas por exceção não passam pelo after_request
+        if getattr(g, 'metrics_rss', None) is not None:
+            rss_monitor.end(g.metrics_rss)
+        profiler = getattr(g, 'metrics_profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            _stop_tracemalloc()
@@ -0,0 +1,151 @@
+import logging
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import workers
+
+# Threads para E/S de banco e coordenação dos jobs (a leitura pesada usa o pool de processos compartilhado)
+JOB_THREADS = int(os.getenv('GMASTER_JOB_THREADS', '8'))
+# Quantidade de jobs finalizados mantidos para consulta
+MAX_FINISHED_JOBS = 200
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Lançada dentro do job quando o cancelamento é solicitado."""
+
+
+class Job:
+    """Execução em segundo plano de uma carga (upload ou banco), com progresso em linhas."""
+
+    def __init__(self, owner: str, kind: str, name: str = None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.kind = kind
+        self.name = name
+        self.status = 'pending'
+        self.rows_processed = 0
+        self.error = None
+        self.dataset_id = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, rows: int):
+        """Soma linhas processadas. Interrompe o job se o cancelamento foi pedido."""
+        self.rows_processed += rows
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def to_dict(self):
+        finished = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "status": self.status,
+            "rows_processed": self.rows_processed,
+            "error": self.error,
+            "dataset_id": self.dataset_id,
+            "elapsed_seconds": round(finished - self.created_at, 3),
+        }
+
+
+class JobManager:
+    """
+    Executa cargas longas fora da requisição. Cada job é coordenado por uma
+    thread (E/S de banco, leitura em blocos); a leitura de formatos que não
+    podem ser lidos em blocos (XLSX, XML, JSON) vai para o pool de processos.
+    O DataFrame resultante é registrado no armazenamento de datasets.
+    """
+
+    def __init__(self, dataset_store, threads: int = JOB_THREADS):
+        self.dataset_store = dataset_store
+        self._thread_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='gmaster-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, kind: str, name: str, func, *args, cleanup=None) -> Job:
+        """
+        Agenda `func(job, *args)`, que deve retornar um DataFrame. `cleanup` é
+        chamado ao final, com sucesso ou erro (por exemplo, para remover arquivos temporários).
+        """
+        job = Job(owner, kind, name)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._thread_pool.submit(self._run, job, func, args, cleanup)
+        return job
+
+    def _run(self, job: Job, func, args, cleanup):
+        if job.cancel_requested:
+            job.status = 'cancelled'
+        else:
+            job.status = 'running'
+            try:
+                df = func(job, *args)
+                if job.cancel_requested:
+                    raise JobCancelled()
+                dataset = self.dataset_store.add(job.owner, df, name=job.name)
+                job.dataset_id = dataset.id
+                job.rows_processed = len(df)
+                job.status = 'done'
+            except JobCancelled:
+                job.status = 'cancelled'
+            except Exception as e:
+                logger.exception("Erro no job %s (%s)", job.id, job.kind)
+                job.error = str(e)
+                job.status = 'error'
+        job.finished_at = time.time()
+        if cleanup:
+            cleanup()
+
+    def run_in_process(self, job: Job, func, *args):
+        """Executa `func(*args)` no pool de processos, aguardando com verificação de cancelamento."""
+        future = workers.submit(func, *args)
+        while True:
+            try:
+                return future.result(timeout=0.2)
+            except TimeoutError:
+                if job.cancel_requested:
+                    # Um processo já em execução não é interrompido; o resultado é descartado
+                    future.cancel()
+                    raise JobCancelled()
+
+    def get(self, job_id: str, owner: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            raise KeyError(job_id)
+        return job
+
+    def cancel(self, job_id: str, owner: str) -> Job:
+        job = self.get(job_id, owner)
+        if job.status in ('pending', 'running'):
+            job._cancel.set()
+        return job
+
+    def stats(self):
+        """Quantidade de jobs por estado (pending, running, done, error, cancelled)."""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job.id]
+
+    def shutdown(self):
+        self._thread_pool.shutdown(wait=False, cancel_futures=True)
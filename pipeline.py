@@ -0,0 +1,160 @@
+import os
+import re
+import json
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import transforms
+import reshape
+from cleaning import clean_frame, parse_rules
+
+# Etapas aceitas no pipeline, com os mesmos parâmetros das rotas individuais
+STEP_PARAMS = {
+    'rename_column': ('currentColumn', 'newColumnName'),
+    'replace_value': ('column', 'oldValue', 'newValue'),
+    'calcular_nova_coluna': ('formula', 'new_column'),
+    'clean_data': ('rules',),
+    'transpor': ('header_column',),
+}
+
+# Parâmetros que podem ser omitidos (têm valor padrão)
+OPTIONAL_PARAMS = ('new_column', 'rules', 'header_column')
+
+_RECIPE_NAME = re.compile(r'^[\w\- ]{1,100}$')
+
+
+def validate_steps(steps):
+    """Valida a lista de etapas ({"op": ..., parâmetros}) antes de executar qualquer uma."""
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("O pipeline deve ter uma lista de etapas.")
+    for index, step in enumerate(steps, start=1):
+        if not isinstance(step, dict) or step.get('op') not in STEP_PARAMS:
+            raise ValueError(f"Etapa {index}: operação inválida. Opções válidas: {list(STEP_PARAMS)}")
+        required = [param for param in STEP_PARAMS[step['op']] if param not in OPTIONAL_PARAMS]
+        missing = [param for param in required if step.get(param) in (None, '')]
+        if missing:
+            raise ValueError(f"Etapa {index} ({step['op']}): parâmetros ausentes {missing}.")
+        if step['op'] == 'clean_data':
+            try:
+                parse_rules(step.get('rules'))
+            except ValueError as e:
+                raise ValueError(f"Etapa {index} (clean_data): {e}")
+    return steps
+
+
+def optimize(steps):
+    """
+    Converte as etapas em um plano de execução, unindo etapas adjacentes que
+    atuam coluna a coluna:
+
+    - renomeações seguidas viram um único rename (a→b, b→c vira a→c);
+    - substituições seguidas na mesma coluna viram um único replace;
+    - colunas calculadas seguidas são criadas sobre o mesmo DataFrame.
+    """
+    plan = []
+    for step in steps:
+        op = step['op']
+        last = plan[-1] if plan else None
+
+        if op == 'rename_column':
+            current, new = step['currentColumn'], step['newColumnName']
+            if last and last['op'] == 'rename':
+                mapping = last['mapping']
+                source = next((old for old, renamed in mapping.items() if renamed == current), current)
+                if source in mapping and mapping[source] != current:
+                    # A coluna já foi renomeada para outro nome; a etapa vai falhar na execução
+                    plan.append({'op': 'rename', 'mapping': {current: new}})
+                else:
+                    mapping[source] = new
+                continue
+            plan.append({'op': 'rename', 'mapping': {current: new}})
+
+        elif op == 'replace_value':
+            column, old, new = step['column'], float(step['oldValue']), float(step['newValue'])
+            if last and last['op'] == 'replace' and last['column'] == column:
+                mapping = last['mapping']
+                # Valores já substituídos para `old` passam a ir direto para `new`
+                for key, value in mapping.items():
+                    if value == old:
+                        mapping[key] = new
+                mapping.setdefault(old, new)
+                continue
+            plan.append({'op': 'replace', 'column': column, 'mapping': {old: new}})
+
+        elif op == 'calcular_nova_coluna':
+            name = step.get('new_column') or f"{step['formula']} (Nova)"
+            if last and last['op'] == 'formulas':
+                last['formulas'].append((name, step['formula']))
+                continue
+            plan.append({'op': 'formulas', 'formulas': [(name, step['formula'])]})
+
+        elif op == 'clean_data':
+            plan.append({'op': 'clean', 'rules': parse_rules(step.get('rules'))})
+
+        elif op == 'transpor':
+            plan.append({'op': 'transpose', 'header_column': step.get('header_column')})
+    return plan
+
+
+def run_plan(df: pd.DataFrame, plan) -> pd.DataFrame:
+    """Executa o plano sobre o DataFrame, sem serializar resultados intermediários."""
+    for step in plan:
+        op = step['op']
+        if op == 'rename':
+            df = transforms.rename_columns(df, step['mapping'])
+        elif op == 'replace':
+            df = transforms.replace_values(df, step['column'], step['mapping'])
+        elif op == 'formulas':
+            df = transforms.add_formula_columns(df, step['formulas'])
+        elif op == 'clean':
+            df, _ = clean_frame(df, step['rules'])
+        elif op == 'transpose':
+            df = reshape.transpose(df, step['header_column'])
+    return df
+
+
+def run_pipeline(df: pd.DataFrame, steps):
+    """Valida, otimiza e executa as etapas. Retorna o DataFrame final e o plano executado."""
+    plan = optimize(validate_steps(steps))
+    return run_plan(df, plan), plan
+
+
+class RecipeStore:
+    """Receitas (pipelines salvos) gravadas como JSON em um diretório, para reaplicar em novos uploads."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        if not name or not _RECIPE_NAME.match(name):
+            raise ValueError("Nome de receita inválido. Use letras, números, espaços, '-' ou '_'.")
+        return self.directory / f"{name}.json"
+
+    def save(self, name: str, steps):
+        path = self._path(name)
+        validate_steps(steps)
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'name': name, 'steps': steps}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+
+    def load(self, name: str):
+        path = self._path(name)
+        if not path.exists():
+            raise LookupError(f"Receita '{name}' não encontrada.")
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['steps']
+
+    def list(self):
+        if not self.directory.exists():
+            return []
+        recipes = []
+        for path in sorted(self.directory.glob('*.json')):
+            with open(path, encoding='utf-8') as f:
+                recipes.append(json.load(f))
+        return recipes
@@ -0,0 +1,187 @@
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Precisão do HyperLogLog: 2^14 registradores (16 KB por coluna, erro padrão de ~0,8%)
+HLL_PRECISION = 14
+# Quantis calculados para colunas numéricas e de datas
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Valores mais frequentes guardados no perfil (a requisição pode pedir menos)
+MAX_TOP_VALUES = 20
+PROFILE_WORKERS = int(os.getenv('GMASTER_PROFILE_WORKERS', str(os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=PROFILE_WORKERS, thread_name_prefix='gmaster-profile')
+        return _pool
+
+
+def hll_registers(values: pd.Series, precision: int = HLL_PRECISION) -> np.ndarray:
+    """
+    Registradores do HyperLogLog dos valores (sem nulos), calculados de forma
+    vetorizada sobre o hash de 64 bits do pandas: os `precision` bits altos
+    escolhem o registrador e a posição do primeiro bit 1 do restante é o posto.
+    """
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    if len(values) == 0:
+        return registers
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # frexp dá a quantidade de bits do restante (exata: o restante cabe na mantissa do float64)
+    _, bits = np.frexp(rest.astype(np.float64))
+    rank = ((64 - precision) - bits + 1).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def hll_estimate(registers: np.ndarray) -> int:
+    """Estimativa de valores distintos a partir dos registradores (com contagem linear para poucos valores)."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+def _scalar(value):
+    """Converte escalares do numpy/pandas em valores serializáveis em JSON (NaN vira None)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if isinstance(value, np.generic):
+        return _scalar(value.item())
+    return value
+
+
+def _kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'categorical'
+    return 'text'
+
+
+def profile_column(series: pd.Series) -> dict:
+    """Perfil de uma coluna: tipo, nulos, distintos (HyperLogLog), faixa, média, quantis e mais frequentes."""
+    values = series.dropna()
+    kind = _kind(series)
+    profile = {
+        "column": str(series.name),
+        "dtype": str(series.dtype),
+        "kind": kind,
+        "count": int(len(values)),
+        "null_count": int(len(series) - len(values)),
+        "distinct_estimate": hll_estimate(hll_registers(values)),
+    }
+
+    if kind == 'numeric' and len(values):
+        numbers = values.to_numpy(dtype='float64')
+        profile.update({
+            "min": _scalar(numbers.min()),
+            "max": _scalar(numbers.max()),
+            "mean": _scalar(numbers.mean()),
+            "std": _scalar(numbers.std(ddof=1)) if len(numbers) > 1 else None,
+            "quantiles": {str(q): _scalar(v) for q, v in zip(QUANTILES, np.quantile(numbers, QUANTILES))},
+        })
+    elif kind == 'datetime' and len(values):
+        profile.update({
+            "min": _scalar(values.min()),
+            "max": _scalar(values.max()),
+            "quantiles": {str(q): _scalar(v) for q, v in values.quantile(list(QUANTILES)).items()},
+        })
+
+    # Categorias são contadas pelos códigos, sem comparar os textos
+    counts = values.value_counts(sort=True).head(MAX_TOP_VALUES)
+    profile["top"] = [{"value": _scalar(value), "count": int(count)} for value, count in counts.items()]
+    return profile
+
+
+def profile_columns(df: pd.DataFrame, columns) -> dict:
+    """Calcula os perfis das colunas em paralelo (pandas e numpy liberam o GIL na maior parte do trabalho)."""
+    if len(columns) <= 1:
+        return {column: profile_column(df[column]) for column in columns}
+    results = _get_pool().map(lambda column: profile_column(df[column]), columns)
+    return dict(zip(columns, results))
+
+
+class ProfileCache:
+    """
+    Perfis por coluna da versão atual de um dataset. Após uma operação, apenas
+    as colunas alteradas (`Operation.columns`) são descartadas; renomear só
+    move o perfil para o novo nome. Operações na tabela inteira limpam tudo.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, columns):
+        """Retorna ({coluna: perfil} já calculados, colunas que faltam, versão)."""
+        with self._lock:
+            found = {column: self._profiles[column] for column in columns if column in self._profiles}
+            return found, [column for column in columns if column not in found], self.version
+
+    def store(self, version: int, profiles: dict):
+        """Guarda perfis calculados na versão `version`; resultados de versões antigas são ignorados."""
+        with self._lock:
+            if version == self.version:
+                self._profiles.update(profiles)
+
+    def apply(self, version: int, operation=None, undone: bool = False):
+        """Atualiza o cache para a nova versão do dataset, conforme a operação aplicada (ou desfeita)."""
+        with self._lock:
+            self.version = version
+            columns = operation.columns if operation is not None else None
+            if columns is None:
+                self._profiles.clear()
+            elif operation.kind == 'rename':
+                old, new = columns if not undone else reversed(columns)
+                profile = self._profiles.pop(old, None)
+                if profile is not None:
+                    self._profiles[new] = {**profile, "column": str(new)}
+            else:
+                for column in columns:
+                    self._profiles.pop(column, None)
+
+
+def dataset_profile(dataset, columns=None, top: int = 10):
+    """
+    Perfil das colunas do dataset, reaproveitando os perfis da versão atual.
+    Retorna (perfis na ordem das colunas, colunas calculadas nesta chamada).
+    """
+    df = dataset.df
+    columns = list(df.columns) if columns is None else list(columns)
+    missing_columns = [column for column in columns if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Colunas inexistentes: {missing_columns}")
+    top = min(max(int(top), 0), MAX_TOP_VALUES)
+
+    # A versão é lida antes da tabela: se o dataset mudar no meio, o resultado é descartado
+    found, missing, version = dataset.profiles.lookup(columns)
+    df = dataset.df
+    if missing:
+        computed = profile_columns(df, missing)
+        dataset.profiles.store(version, computed)
+        found.update(computed)
+    return [{**found[column], "top": found[column]["top"][:top]} for column in columns], missing
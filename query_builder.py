@@ -0,0 +1,142 @@
+from sqlalchemy import select, func, distinct, and_, Table
+
+# Operadores de filtro aceitos na consulta estruturada
+FILTER_OPERATORS = {
+    'eq': lambda col, value: col == value,
+    'ne': lambda col, value: col != value,
+    'lt': lambda col, value: col < value,
+    'le': lambda col, value: col <= value,
+    'gt': lambda col, value: col > value,
+    'ge': lambda col, value: col >= value,
+    'in': lambda col, value: col.in_(value),
+    'not_in': lambda col, value: col.not_in(value),
+    'like': lambda col, value: col.like(value),
+    'ilike': lambda col, value: col.ilike(value),
+    'between': lambda col, value: col.between(value[0], value[1]),
+    'is_null': lambda col, value: col.is_(None),
+    'not_null': lambda col, value: col.is_not(None),
+}
+
+# Funções de agregação aceitas
+AGGREGATIONS = {
+    'count': func.count,
+    'count_distinct': lambda col: func.count(distinct(col)),
+    'sum': func.sum,
+    'avg': func.avg,
+    'min': func.min,
+    'max': func.max,
+}
+
+
+# Tipos aceitos como valor de filtro (o JSON não traz objetos do banco)
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _list_param(value, param: str, item_type, item_label: str) -> list:
+    """Valida um parâmetro da consulta que deve ser uma lista de `item_type`."""
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(item, item_type) for item in value):
+        raise ValueError(f"O parâmetro '{param}' deve ser uma lista de {item_label}.")
+    return value
+
+
+def _int_param(value, param: str):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"O parâmetro '{param}' deve ser um número inteiro.")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"O parâmetro '{param}' deve ser um número inteiro.")
+
+
+def _column(table: Table, name: str):
+    if not isinstance(name, str):
+        raise ValueError(f"Nome de coluna inválido: {name!r}.")
+    if name not in table.c:
+        raise ValueError(f"A coluna '{name}' não existe na tabela '{table.name}'.")
+    return table.c[name]
+
+
+def _filter_clause(table: Table, spec: dict):
+    op = spec.get('op', 'eq')
+    if op not in FILTER_OPERATORS:
+        raise ValueError(f"Operador de filtro inválido: '{op}'. Opções válidas: {list(FILTER_OPERATORS)}")
+    value = spec.get('value')
+    values = value if isinstance(value, list) else [value]
+    if not all(isinstance(item, SCALAR_TYPES) for item in values):
+        raise ValueError("Os valores dos filtros devem ser textos, números, booleanos ou nulos.")
+    if op in ('in', 'not_in') and not isinstance(value, list):
+        raise ValueError(f"O operador '{op}' exige uma lista de valores.")
+    if op == 'between' and not (isinstance(value, list) and len(value) == 2):
+        raise ValueError("O operador 'between' exige uma lista com dois valores.")
+    return FILTER_OPERATORS[op](_column(table, spec.get('column')), value)
+
+
+def _aggregation(table: Table, spec: dict):
+    name = spec.get('func')
+    if name not in AGGREGATIONS:
+        raise ValueError(f"Agregação inválida: '{name}'. Opções válidas: {list(AGGREGATIONS)}")
+    column = spec.get('column', '*')
+    if column == '*':
+        if name != 'count':
+            raise ValueError("Apenas 'count' pode ser usado com '*'.")
+        expr = func.count()
+    else:
+        expr = AGGREGATIONS[name](_column(table, column))
+    alias = spec.get('alias')
+    if alias is not None and not isinstance(alias, str):
+        raise ValueError("O apelido ('alias') da agregação deve ser um texto.")
+    return expr.label(alias or f"{name}_{'all' if column == '*' else column}")
+
+
+def build_query(table: Table, columns=None, filters=None, sort=None, limit: int = None,
+                offset: int = None, aggregations=None, group_by=None):
+    """
+    Compila uma consulta estruturada em um SELECT do SQLAlchemy Core sobre a
+    tabela reflexionada, para que filtros, projeção, ordenação, agregações e
+    limite sejam executados pelo próprio banco.
+
+    Exemplo:
+        {"columns": ["nome"], "filters": [{"column": "id", "op": "gt", "value": 10}],
+         "sort": [{"column": "nome", "direction": "desc"}], "limit": 100}
+    """
+    columns = _list_param(columns, 'columns', str, 'nomes de colunas')
+    group_by = _list_param(group_by, 'group_by', str, 'nomes de colunas')
+    filters = _list_param(filters, 'filters', dict, 'objetos {"column", "op", "value"}')
+    sort = _list_param(sort, 'sort', dict, 'objetos {"column", "direction"}')
+    aggregations = _list_param(aggregations, 'aggregations', dict, 'objetos {"func", "column"}')
+    limit, offset = _int_param(limit, 'limit'), _int_param(offset, 'offset')
+
+    group_cols = [_column(table, name) for name in group_by]
+    if aggregations:
+        selected = group_cols + [_aggregation(table, spec) for spec in aggregations]
+        stmt = select(*selected)
+        if group_cols:
+            stmt = stmt.group_by(*group_cols)
+    elif group_by:
+        raise ValueError("'group_by' exige ao menos uma agregação.")
+    elif columns:
+        stmt = select(*[_column(table, name) for name in columns])
+    else:
+        stmt = select(table)
+
+    if filters:
+        stmt = stmt.where(and_(*[_filter_clause(table, spec) for spec in filters]))
+
+    # A ordenação pode usar colunas da tabela ou apelidos das agregações
+    output = {col.name: col for col in stmt.selected_columns}
+    for spec in sort:
+        name = spec.get('column')
+        col = output.get(name)
+        if col is None:
+            col = _column(table, name)
+        stmt = stmt.order_by(col.desc() if str(spec.get('direction', 'asc')).lower() == 'desc' else col.asc())
+
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset:
+        stmt = stmt.offset(offset)
+    return stmt
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Quantidade máxima de colunas que uma reorganização pode gerar
+MAX_OUTPUT_COLUMNS = int(os.getenv('GMASTER_RESHAPE_MAX_COLUMNS', '10000'))
+
+# Agregações aceitas no pivot
+PIVOT_AGGREGATIONS = ('sum', 'mean', 'count', 'min', 'max', 'first', 'last', 'nunique')
+
+
+def _check_width(width: int, max_columns: int):
+    if width > max_columns:
+        raise ValueError(
+            f"O resultado teria {width} colunas (limite: {max_columns}). "
+            "Filtre os dados ou use a coluna de cabeçalho/agrupamento com menos valores."
+        )
+
+
+def _check_columns(df: pd.DataFrame, columns, param: str):
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Parâmetro '{param}': colunas inexistentes {missing}.")
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _block_values(df: pd.DataFrame) -> np.ndarray:
+    """
+    Valores da tabela como uma única matriz, no tipo mais específico possível:
+    colunas numéricas continuam numéricas (float com NaN quando há anuláveis);
+    apenas tabelas com tipos misturados viram object.
+    """
+    dtypes = list(df.dtypes)
+    numeric = all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                  for dtype in dtypes)
+    if numeric and all(isinstance(dtype, np.dtype) for dtype in dtypes):
+        return df.to_numpy()
+    if numeric:
+        return df.to_numpy(dtype='float64', na_value=np.nan)
+    return df.to_numpy(dtype=object)
+
+
+def transpose(df: pd.DataFrame, header_column=None, max_columns: int = MAX_OUTPUT_COLUMNS) -> pd.DataFrame:
+    """
+    Transpõe a tabela sem converter célula a célula. Sem `header_column`, a
+    primeira coluna ('0') recebe os nomes das colunas originais e cada linha
+    vira uma coluna ('1', '2', ...). Com `header_column`, os valores dessa
+    coluna passam a ser os nomes das novas colunas.
+    """
+    if header_column is not None:
+        _check_columns(df, [header_column], 'header_column')
+        names = [str(value) for value in df[header_column]]
+        if len(set(names) | {str(header_column)}) != len(names) + 1:
+            raise ValueError(f"A coluna '{header_column}' possui valores repetidos e não pode ser usada como cabeçalho.")
+        body = df.drop(columns=[header_column])
+    else:
+        names = [str(position) for position in range(1, len(df) + 1)]
+        body = df
+    _check_width(len(names) + 1, max_columns)
+
+    values = _block_values(body).T
+    result = pd.DataFrame(values, columns=pd.Index(names, dtype=object))
+    result.insert(0, header_column if header_column is not None else '0',
+                  pd.Series([str(col) for col in body.columns], dtype=object))
+    return result
+
+
+def melt(df: pd.DataFrame, id_vars=None, value_vars=None, var_name: str = 'variavel',
+         value_name: str = 'valor') -> pd.DataFrame:
+    """Converte colunas em linhas (unpivot): uma linha por combinação de identificador e coluna."""
+    id_vars, value_vars = _as_list(id_vars), _as_list(value_vars)
+    _check_columns(df, id_vars, 'id_vars')
+    _check_columns(df, value_vars, 'value_vars')
+    if not value_vars:
+        value_vars = [col for col in df.columns if col not in id_vars]
+    if not value_vars:
+        raise ValueError("Nenhuma coluna para converter em linhas.")
+    conflicts = {var_name, value_name} & set(id_vars)
+    if conflicts or var_name == value_name:
+        raise ValueError("Os nomes das colunas de variável e valor devem ser diferentes entre si e dos identificadores.")
+    if value_name in df.columns:
+        raise ValueError(f"A coluna '{value_name}' já existe; informe outro nome em 'value_name'.")
+    return pd.melt(df, id_vars=id_vars, value_vars=value_vars, var_name=var_name, value_name=value_name)
+
+
+def pivot(df: pd.DataFrame, index, columns, values=None, aggfunc: str = 'sum',
+          max_columns: int = MAX_OUTPUT_COLUMNS) -> pd.DataFrame:
+    """
+    Converte os valores de `columns` em colunas, agregando `values` por `index`.
+    A largura do resultado é verificada antes do pivot, pela quantidade de valores distintos.
+    """
+    index, columns, values = _as_list(index), _as_list(columns), _as_list(values)
+    if not index or not columns:
+        raise ValueError("Informe as colunas de 'index' e 'columns' do pivot.")
+    if aggfunc not in PIVOT_AGGREGATIONS:
+        raise ValueError(f"Agregação inválida. Opções válidas: {list(PIVOT_AGGREGATIONS)}")
+    _check_columns(df, index + columns + values, 'pivot')
+    if not values:
+        values = [col for col in df.columns if col not in index + columns]
+    if not values:
+        raise ValueError("Nenhuma coluna de valores para o pivot.")
+
+    groups = len(df[columns].drop_duplicates()) if len(columns) > 1 else df[columns[0]].nunique(dropna=True)
+    _check_width(len(index) + groups * len(values), max_columns)
+
+    result = df.pivot_table(index=index, columns=columns, values=values, aggfunc=aggfunc, observed=True, sort=True)
+    # Nomes planos: 'valor_A' com várias colunas de valores, 'A' com apenas uma
+    flat = []
+    for key in result.columns:
+        parts = [str(part) for part in (key if isinstance(key, tuple) else (key,))]
+        flat.append('_'.join(parts[1:]) if len(values) == 1 else '_'.join(parts))
+    result.columns = flat
+    return result.reset_index()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Colunas de texto com até esta fração de valores distintos viram categorias
+CATEGORY_MAX_RATIO = 0.5
+# Abaixo desta quantidade de linhas a conversão não compensa
+MIN_ROWS = 64
+
+
+def _compact_integer(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series, downcast='integer')
+
+
+def _compact_float(series: pd.Series) -> pd.Series:
+    """
+    Floats que são inteiros com nulos viram inteiros anuláveis (Int8..Int64);
+    os demais só são reduzidos para float32 quando nenhum valor muda.
+    """
+    values = series.to_numpy()
+    finite = np.isfinite(values)
+    if series.hasnans and np.array_equal(finite, ~np.isnan(values)):
+        present = values[finite]
+        if (present == np.round(present)).all() and (np.abs(present) < 2 ** 53).all():
+            return pd.to_numeric(series.astype('Int64'), downcast='integer')
+    reduced = values.astype('float32')
+    if np.array_equal(reduced.astype('float64'), values, equal_nan=True):
+        return pd.Series(reduced, index=series.index, name=series.name)
+    return series
+
+
+def _compact_text(series: pd.Series) -> pd.Series:
+    """Colunas só de texto com poucos valores distintos viram categorias."""
+    if pd.api.types.infer_dtype(series, skipna=True) != 'string':
+        return series
+    if series.nunique(dropna=True) > len(series) * CATEGORY_MAX_RATIO:
+        return series
+    return series.astype('category')
+
+
+def compact_series(series: pd.Series) -> pd.Series:
+    """Retorna a coluna no menor tipo que representa os mesmos valores."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(dtype):
+        return _compact_integer(series)
+    if pd.api.types.is_float_dtype(dtype) and isinstance(dtype, np.dtype):
+        return _compact_float(series)
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return _compact_text(series)
+    # Datas permanecem como datetime até a serialização
+    return series
+
+
+def compact_frame(df: pd.DataFrame):
+    """
+    Reduz a memória do DataFrame carregado: inteiros e floats no menor tipo sem
+    perda, inteiros com nulos como tipos anuláveis e textos repetitivos como
+    categorias. Retorna o DataFrame e a memória (bytes) antes e depois.
+    """
+    before = int(df.memory_usage(deep=True, index=True).sum())
+    if len(df) < MIN_ROWS:
+        return df, {"memory_before": before, "memory_after": before}
+
+    compacted = {}
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        result = compact_series(series)
+        if result is not series:
+            compacted[position] = result
+    if compacted:
+        df = df.copy(deep=False)
+        for position, series in compacted.items():
+            df.isetitem(position, series)
+
+    after = int(df.memory_usage(deep=True, index=True).sum())
+    return df, {"memory_before": before, "memory_after": after}
@@ -0,0 +1,120 @@
+import json
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # O formato Arrow fica indisponível sem o pyarrow
+    pa = None
+
+RECORDS_MIMETYPE = 'application/json'
+COLUMNAR_MIMETYPE = 'application/vnd.gmaster.columnar+json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Formatos aceitos em `?format=` e seus tipos MIME correspondentes
+FORMATS = {
+    'records': RECORDS_MIMETYPE,
+    'columnar': COLUMNAR_MIMETYPE,
+    'arrow': ARROW_MIMETYPE,
+}
+
+
+def negotiate_format(request) -> str:
+    """
+    Escolhe o formato da resposta pelo parâmetro `format` ou pelo cabeçalho Accept.
+    Sem preferência explícita, mantém a lista de registros usada originalmente.
+    """
+    requested = request.args.get('format')
+    if requested not in FORMATS:
+        offered = [RECORDS_MIMETYPE, COLUMNAR_MIMETYPE] + ([ARROW_MIMETYPE] if pa else [])
+        best = request.accept_mimetypes.best_match(offered, default=RECORDS_MIMETYPE)
+        requested = next(name for name, mimetype in FORMATS.items() if mimetype == best)
+    if requested == 'arrow' and pa is None:
+        # Sem pyarrow, o formato colunar em JSON é o mais próximo
+        return 'columnar'
+    return requested
+
+
+def frame_to_records(df: pd.DataFrame):
+    """Converte o DataFrame para a lista de registros usada pelo frontend."""
+    datetime_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    if len(datetime_cols):
+        df = df.copy()
+        for col in datetime_cols:
+            df[col] = df[col].astype(str)
+    # Via object, para que colunas anuláveis e categorias aceitem o marcador "null"
+    return df.astype(object).where(df.notna(), "null").to_dict(orient='records')
+
+
+def _column_values(series: pd.Series) -> list:
+    """Valores da coluna como lista, mantendo números como números e nulos como None."""
+    notna = series.notna()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.astype(str)
+    return series.astype(object).where(notna, None).tolist()
+
+
+def frame_to_columnar(df: pd.DataFrame, info: dict = None) -> bytes:
+    """
+    Serializa o DataFrame em JSON colunar: os nomes das colunas aparecem uma vez
+    e cada coluna é um array tipado, com nulos preservados como null.
+    """
+    payload = dict(info or {})
+    payload.update({
+        'columns': [str(col) for col in df.columns],
+        'dtypes': [str(dtype) for dtype in df.dtypes],
+        'data': [_column_values(df[col]) for col in df.columns],
+    })
+    return json.dumps(payload, default=str, ensure_ascii=False).encode('utf-8')
+
+
+def _mixed_as_text(df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """Converte para texto as colunas object (ou as de `columns`) que o Arrow não aceita por misturar tipos."""
+    df = df.copy(deep=False)
+    check = columns is None
+    if check:
+        columns = [col for col in df.columns if pd.api.types.is_object_dtype(df[col])]
+    for col in columns:
+        if check:
+            try:
+                pa.array(df[col], from_pandas=True)
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        df[col] = df[col].astype(str).where(df[col].notna(), None)
+    return df
+
+
+def arrow_table(df: pd.DataFrame, schema=None):
+    """
+    Converte o DataFrame para uma tabela Arrow; colunas com tipos misturados viram texto.
+    Com `schema` (de `arrow_schema`), a tabela segue esse schema, como nos blocos de um mesmo arquivo.
+    """
+    df = df.rename(columns=str).reset_index(drop=True)
+    if schema is not None:
+        # Colunas object que no frame inteiro são texto podem ter só números (ou só nulos) neste bloco
+        text = [field.name for field in schema
+                if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)]
+        text = [col for col in text if pd.api.types.is_object_dtype(df[col])]
+        return pa.Table.from_pandas(_mixed_as_text(df, text), schema=schema, preserve_index=False)
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Colunas com tipos misturados são enviadas como texto
+        return pa.Table.from_pandas(_mixed_as_text(df), preserve_index=False)
+
+
+def arrow_schema(df: pd.DataFrame):
+    """Schema Arrow do DataFrame inteiro (colunas com tipos misturados como texto), para escrevê-lo em blocos."""
+    return pa.Schema.from_pandas(_mixed_as_text(df.rename(columns=str)), preserve_index=False)
+
+
+def frame_to_arrow(df: pd.DataFrame, info: dict = None) -> bytes:
+    """Serializa o DataFrame no formato Arrow IPC (stream), com os metadados do dataset no schema."""
+    table = arrow_table(df)
+    if info:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'gmaster': json.dumps(info, default=str)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
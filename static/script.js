@@ -1,28 +1,97 @@
-let rawData = []; // Variável para armazenar os dados carregados
+let currentDatasetId = null; // ID do dataset mantido no servidor
+// Formato colunar: nomes das colunas uma única vez e um array tipado por coluna
+const COLUMNAR_MIMETYPE = 'application/vnd.gmaster.columnar+json';
+
+// Converte a resposta colunar em linhas (arrays) para a DataTable
+function columnarToRows(result) {
+    const columnsData = result.data;
+    const rowCount = columnsData.length ? columnsData[0].length : 0;
+    const rows = new Array(rowCount);
+    for (let r = 0; r < rowCount; r++) {
+        rows[r] = columnsData.map(values => values[r]);
+    }
+    return rows;
+}
+
+// Atualiza o dataset atual a partir da resposta do servidor
+function loadDatasetResponse(result) {
+    currentDatasetId = result.dataset_id;
+    initializeTable(result);
+    fetchHistory();
+}
+
+// Busca uma janela de linhas do dataset no servidor
+async function fetchRows(datasetId, offset, limit, sort, order, search) {
+    const params = new URLSearchParams({ offset, limit });
+    if (sort) {
+        params.append('sort', sort);
+        params.append('order', order);
+    }
+    if (search) {
+        params.append('search', search);
+    }
+    const response = await fetch(`/datasets/${datasetId}/rows?${params.toString()}`, {
+        headers: { 'Accept': COLUMNAR_MIMETYPE }
+    });
+    const result = await response.json();
+    if (!response.ok) {
+        throw new Error(result.error);
+    }
+    return result;
+}
 
-// Inicializa a DataTable com os dados
-function initializeTable(data) {
+// Inicializa a DataTable com a primeira página; as demais são buscadas sob demanda
+function initializeTable(result) {
     if ($.fn.DataTable.isDataTable('#data-table')) {
         $('#data-table').DataTable().destroy();
         $('#data-table').empty();
     }
 
-    if (!data || data.length === 0) {
+    if (!result || !result.columns || result.columns.length === 0) {
         console.error("No data received");
         return;
     }
 
+    const datasetId = result.dataset_id;
+    const columns = result.columns;
+    let firstPage = columnarToRows(result); // Já recebida junto com o carregamento
+
     $('#data-table').DataTable({
-        data: data,
-        columns: Object.keys(data[0]).map(key => ({ title: key, data: key })),
-        paging: true,
+        columns: columns.map((key, index) => ({ title: key, data: index, defaultContent: 'null' })),
+        serverSide: true,
         searching: true,
         ordering: true,
+        order: [],
         autoWidth: true,
-        // scrollX: true,
-        // scrollY: '90vh',
-        // scrollCollapse: true,
-        // fixedHeader: true
+        deferRender: true,
+        scrollX: true,
+        scrollY: '70vh',
+        scroller: { loadingIndicator: true },
+        ajax: function (params, callback) {
+            const sortSpec = params.order.length ? params.order[0] : null;
+            const search = params.search.value;
+
+            if (firstPage && params.start === 0 && !sortSpec && !search &&
+                (params.length <= firstPage.length || firstPage.length === result.row_count)) {
+                const data = firstPage.slice(0, params.length);
+                firstPage = null;
+                callback({ draw: params.draw, recordsTotal: result.row_count, recordsFiltered: result.row_count, data });
+                return;
+            }
+
+            const sort = sortSpec ? columns[sortSpec.column] : null;
+            fetchRows(datasetId, params.start, params.length, sort, sortSpec ? sortSpec.dir : 'asc', search)
+                .then(page => callback({
+                    draw: params.draw,
+                    recordsTotal: page.row_count,
+                    recordsFiltered: page.filtered_count,
+                    data: columnarToRows(page)
+                }))
+                .catch(error => {
+                    console.error("Erro ao buscar linhas:", error);
+                    alert(`Erro ao buscar linhas: ${error.message}`);
+                });
+        }
     });
 }
 
@@ -35,33 +104,94 @@ function updateHistory(operation) {
 }
 
 function fetchHistory() {
-    fetch('/get_history')
+    if (!currentDatasetId) {
+        return;
+    }
+    fetch(`/get_history?dataset_id=${currentDatasetId}`)
         .then(response => response.json())
         .then(data => {
+            if (data.error) {
+                console.error("Erro ao carregar histórico:", data.error);
+                return;
+            }
             const historyList = document.getElementById('historyList');
             historyList.innerHTML = '';
             data.forEach(item => {
                 const listItem = document.createElement('li');
                 listItem.textContent = item.operation;
+                if (item.undone) {
+                    listItem.style.textDecoration = 'line-through';
+                }
                 historyList.appendChild(listItem);
             });
         });
 }
 
-function undoLastOperation() {
-    fetch('/undo', { method: 'POST' })
+function sendHistoryAction(url) {
+    if (!currentDatasetId) {
+        alert("Por favor, carregue um arquivo primeiro.");
+        return;
+    }
+    fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': COLUMNAR_MIMETYPE
+        },
+        body: JSON.stringify({ dataset_id: currentDatasetId })
+    })
         .then(response => response.json())
         .then(data => {
             if (data.error) {
                 alert(data.error);
             } else {
                 // Atualiza a tabela com o estado anterior
-                initializeTable(data);
-                fetchHistory();
+                loadDatasetResponse(data);
             }
         });
 }
 
+function undoLastOperation() {
+    sendHistoryAction('/undo');
+}
+
+function redoLastOperation() {
+    sendHistoryAction('/redo');
+}
+
+
+// Acompanha um job em segundo plano até terminar, mostrando as linhas processadas
+async function waitForJob(job) {
+    const progress = document.getElementById('jobProgress');
+    progress.style.display = 'block';
+    try {
+        while (job.status === 'pending' || job.status === 'running') {
+            progress.textContent = `${job.name}: ${job.rows_processed} linhas processadas`;
+            await new Promise(resolve => setTimeout(resolve, 500));
+            const response = await fetch(`/jobs/${job.job_id}`);
+            job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.error);
+            }
+        }
+    } finally {
+        progress.style.display = 'none';
+    }
+    if (job.status === 'cancelled') {
+        throw new Error("Carga cancelada.");
+    }
+    if (job.status === 'error') {
+        throw new Error(job.error);
+    }
+    return job;
+}
+
+// Carrega a primeira página do dataset criado pelo job
+async function loadJobDataset(job) {
+    const result = await fetchRows(job.dataset_id, 0, 100);
+    loadDatasetResponse(result);
+    return result;
+}
 
 async function uploadFile() {
     const fileInput = document.getElementById('fileInput');
@@ -74,9 +204,13 @@ async function uploadFile() {
 
     const formData = new FormData();
     formData.append('file', file);
+    const sheets = document.getElementById('sheetsInput').value.trim();
+    if (sheets) {
+        formData.append('sheets', sheets);
+    }
 
     try {
-        const response = await fetch('http://127.0.0.1:5000/upload', {
+        const response = await fetch('http://127.0.0.1:5000/jobs/upload', {
             method: 'POST',
             body: formData
         });
@@ -85,8 +219,7 @@ async function uploadFile() {
             throw new Error("Erro no upload do arquivo.");
         }
 
-        rawData = await response.json();
-        initializeTable(rawData);
+        await loadJobDataset(await waitForJob(await response.json()));
     } catch (error) {
         console.error("Erro:", error);
         alert("Falha ao ler o arquivo.");
@@ -98,9 +231,10 @@ async function transpor() {
         const response = await fetch('http://127.0.0.1:5000/transpor', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': COLUMNAR_MIMETYPE
             },
-            body: JSON.stringify({ data: rawData })
+            body: JSON.stringify({ dataset_id: currentDatasetId })
 
         });
 
@@ -110,9 +244,7 @@ async function transpor() {
             return;
         }
 
-        const result = await response.json();
-        rawData = result;
-        initializeTable(rawData);
+        loadDatasetResponse(await response.json());
     } catch (error) {
         console.error("Erro:", error);
         alert("Falha ao carregar o arquivo.");
@@ -121,7 +253,7 @@ async function transpor() {
 
 // Função para limpar dados do arquivo .txt
 async function cleanData() {
-    if (!rawData || rawData.length === 0) {
+    if (!currentDatasetId) {
         alert("Por favor, carregue um arquivo primeiro.");
         return;
     }
@@ -130,9 +262,10 @@ async function cleanData() {
         const response = await fetch('/clean_data', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': COLUMNAR_MIMETYPE
             },
-            body: JSON.stringify({ data: rawData })
+            body: JSON.stringify({ dataset_id: currentDatasetId })
         });
 
         if (!response.ok) {
@@ -142,14 +275,33 @@ async function cleanData() {
         }
 
         const result = await response.json();
-        rawData = result; // Atualiza o rawData com os dados limpos
-        initializeTable(rawData); // Exibe a tabela com os dados limpos
+        loadDatasetResponse(result); // Exibe a tabela com os dados limpos
+        const report = result.cleaning_report || {};
+        const removed = (report.drop_blank || 0) + (report.dedupe || 0);
+        alert(`Limpeza concluída: ${removed} linha(s) removida(s).`);
     } catch (error) {
         console.error("Erro:", error);
         alert("Falha ao limpar os dados.");
     }
 }
 
+// Baixa o dataset do servidor no formato escolhido (gerado em blocos pelo servidor)
+function exportarDados() {
+    if (!currentDatasetId) {
+        alert("Por favor, carregue um arquivo primeiro.");
+        return;
+    }
+    const format = (prompt("Formato de exportação (csv, parquet ou xlsx):", "csv") || "").trim().toLowerCase();
+    if (!format) {
+        return;
+    }
+    if (!['csv', 'parquet', 'xlsx'].includes(format)) {
+        alert("Formato inválido.");
+        return;
+    }
+    window.location.href = `/datasets/${currentDatasetId}/export?format=${format}`;
+}
+
 // Função para aplicar fórmula personalizada
 async function calcularNovaColuna() {
     const formula = document.getElementById('formulaInput').value;
@@ -162,28 +314,22 @@ async function calcularNovaColuna() {
         return;
     }
 
-    const regex = /^[\w\d\s()+\-*/x.]+$/; // Permitir colunas, números, operadores matemáticos e espaços
-    if (!regex.test(formula)) {
-        alert("Fórmula inválida. Use apenas operadores matemáticos (+, -, *, /), parênteses, números e nomes de colunas.");
-        return;
-    }
+    // A fórmula é validada no servidor (operadores, funções e nomes de colunas permitidos)
 
     try {
         // Enviar dados para o backend
         const response = await fetch('http://127.0.0.1:5000/calcular_nova_coluna', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'Accept': COLUMNAR_MIMETYPE },
             body: JSON.stringify({
                 formula: formula,
                 new_column: newColumnName,
-                data: rawData // Substitua por seus dados reais do DataFrame
+                dataset_id: currentDatasetId
             })
         });    
     
         if (response.ok) {
-            const result = await response.json();
-            rawData = result;
-            initializeTable(rawData);
+            loadDatasetResponse(await response.json());
             closeFormulaModal(); // Função para atualizar a tabela no frontend
         } else {
             const error = await response.json();
@@ -211,9 +357,10 @@ async function submitRenameColumn() {
         const response = await fetch('http://127.0.0.1:5000/rename_column', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': COLUMNAR_MIMETYPE
             },
-            body: JSON.stringify({ currentColumn, newColumnName, rawData })
+            body: JSON.stringify({ currentColumn, newColumnName, dataset_id: currentDatasetId })
         });
 
         if (!response.ok) {
@@ -224,8 +371,7 @@ async function submitRenameColumn() {
 
         const result = await response.json();
         alert("Coluna renomeada com sucesso!");
-        rawData = result;
-        initializeTable(rawData); // Atualiza a tabela com os novos nomes de coluna
+        loadDatasetResponse(result); // Atualiza a tabela com os novos nomes de coluna
         closeModal();
     } catch (error) {
         console.error("Erro:", error);
@@ -247,14 +393,15 @@ async function trocarValor() {
         column: columnName,
         oldValue: currentValue,
         newValue: newValue,
-        data: rawData
+        dataset_id: currentDatasetId
     };
 
     try {
         const response = await fetch('http://127.0.0.1:5000/replace_value', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': COLUMNAR_MIMETYPE
             },
             body: JSON.stringify(requestData)
         });
@@ -267,8 +414,7 @@ async function trocarValor() {
 
         const result = await response.json();
         alert("Valores Substituídos com sucesso!");
-        rawData = result;
-        initializeTable(rawData); // Atualiza a tabela com os novos 
+        loadDatasetResponse(result); // Atualiza a tabela com os novos 
         closeModal();
     } catch (error) {
         console.error("Erro:", error);
@@ -294,7 +440,8 @@ function carregarBancoDeDados() {
     fetch('/database', {
         method: 'POST',
         headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept': COLUMNAR_MIMETYPE
         },
         body: JSON.stringify({
             action: 'set_database', // Primeiro configura o banco
@@ -308,32 +455,30 @@ function carregarBancoDeDados() {
             return;
         }
 
-        // Configuração bem-sucedida, agora carrega os dados da tabela
-        fetch('/database', {
+        // Configuração bem-sucedida, agora carrega os dados da tabela em segundo plano
+        fetch('/jobs/database', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 action: 'load_table',
                 table_name: dbTable
             })
         })
-        .then(response => response.json())
-        .then(data => {
-            if (data.error) {
-                alert(`Erro ao carregar dados: ${data.error}`);
-            } else {
-                alert(`Dados carregados com sucesso: ${data.row_count} registros encontrados.`);
-                rawData = data.data; // Atualiza os dados carregados
-                initializeTable(rawData); // Atualiza a tabela
-                console.log("Dados carregados:", rawData);
-                closeDatabaseModal();
+        .then(async response => {
+            const job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.error);
             }
+            closeDatabaseModal();
+            return loadJobDataset(await waitForJob(job));
+        })
+        .then(data => {
+            alert(`Dados carregados com sucesso: ${data.row_count} registros encontrados.`);
+            console.log("Dataset carregado:", data.dataset_id);
         })
         .catch(error => {
             console.error('Erro ao carregar dados:', error);
-            alert('Erro ao carregar dados.');
+            alert(`Erro ao carregar dados: ${error.message}`);
         });
     })
     .catch(error => {
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Cache de uploads e receitas isolados dos dados locais
+os.environ.setdefault('GMASTER_UPLOAD_CACHE_DIR', tempfile.mkdtemp(prefix='gmaster-cache-'))
+os.environ.setdefault('GMASTER_RECIPES_DIR', tempfile.mkdtemp(prefix='gmaster-recipes-'))
+
+
+@pytest.fixture
+def client():
+    import app
+    return app.app.test_client()
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from cleaning import clean_frame, parse_rules
+
+
+def frame():
+    return pd.DataFrame({
+        'nome': ['  Ana ', 'Bia', 'N/A', 'Ana', 'Caio', ''],
+        'idade': ['30', '25', 'x', '30', '41.5', '19'],
+        'ativo': ['sim', 'não', 'true', 'sim', None, '0'],
+    })
+
+
+def test_default_rule_drops_rows_with_blank_cells():
+    df, report = clean_frame(frame(), parse_rules(None))
+    assert report == {'drop_blank': 2}
+    assert df['nome'].tolist() == ['  Ana ', 'Bia', 'N/A', 'Ana']
+
+
+def test_rules_apply_in_order_and_report_affected_rows():
+    rules = parse_rules({'trim': True, 'normalize_nulls': ['nome'], 'coerce': {'idade': 'int', 'ativo': 'bool'},
+                         'drop_blank': ['nome'], 'dedupe': ['nome', 'idade']})
+    df, report = clean_frame(frame(), rules)
+
+    assert report == {'trim': 1, 'normalize_nulls': 2, 'coerce': 2, 'drop_blank': 2, 'dedupe': 1}
+    assert df['nome'].tolist() == ['Ana', 'Bia', 'Caio']
+    assert df['idade'].tolist()[:2] == [30, 25]
+    assert pd.isna(df['idade'].iloc[2])
+    assert df['ativo'].tolist()[:2] == [True, False]
+    assert pd.isna(df['ativo'].iloc[2])
+
+
+@pytest.mark.parametrize('rules', [
+    'trim',
+    {'limpar': True},
+    {'coerce': {'idade': 'decimal'}},
+    {'coerce': ['idade']},
+    {'trim': 'nome'},
+])
+def test_invalid_rules_are_rejected(rules):
+    with pytest.raises(ValueError):
+        parse_rules(rules)
+
+
+def test_rule_on_missing_column_is_rejected():
+    with pytest.raises(ValueError, match='inexistentes'):
+        clean_frame(frame(), parse_rules({'dedupe': ['cidade']}))
@@ -0,0 +1,18 @@
+import pytest
+from sqlalchemy import create_engine
+
+from database_manager import DatabaseConnectionManager
+
+
+def test_session_without_database_does_not_use_the_last_configured_engine(monkeypatch):
+    manager = DatabaseConnectionManager()
+    engine = create_engine('sqlite://')
+    monkeypatch.setattr(manager, 'get_engine', lambda db_type: engine)
+    # Outro usuário configurou um banco; esta sessão não tem db_type
+    manager.configure_connection('sqlite')
+
+    with pytest.raises(ValueError, match='não configurada'):
+        manager.load_table_frame('clientes')
+    with pytest.raises(ValueError, match='não configurada'):
+        manager.query_frame('clientes', {})
+    assert manager.resolve_engine('sqlite') is engine
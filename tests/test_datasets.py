@@ -0,0 +1,84 @@
+import io
+
+
+def upload(client, content: str, filename: str):
+    response = client.post('/upload', data={'file': (io.BytesIO(content.encode('utf-8')), filename)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+TXT = ''.join(f"|{i}|{i * 2}|x{i % 3}|\n" for i in range(100))
+
+
+def test_txt_columns_are_addressable_by_name(client):
+    dataset = upload(client, TXT, 'dados.txt')
+    dataset_id = dataset['dataset_id']
+    assert dataset['columns'] == ['1', '2', '3']
+
+    rows = client.get(f'/datasets/{dataset_id}/rows?sort=2&order=desc&limit=1')
+    assert rows.status_code == 200
+    assert rows.get_json()['data'][0]['2'] == 198
+
+    profile = client.get(f'/datasets/{dataset_id}/profile?columns=2')
+    assert profile.status_code == 200
+    assert profile.get_json()['columns'][0]['max'] == 198
+
+    replaced = client.post('/replace_value', json={'dataset_id': dataset_id, 'column': '2', 'oldValue': 0, 'newValue': 7})
+    assert replaced.status_code == 200
+
+    renamed = client.post('/rename_column', json={'dataset_id': dataset_id, 'currentColumn': '2', 'newColumnName': 'dobro'})
+    assert renamed.status_code == 200
+    assert renamed.get_json()['columns'] == ['1', 'dobro', '3']
+
+
+def test_replace_accepts_values_outside_compacted_dtype(client):
+    # Inteiros com nulos são compactados para Int8; a substituição não pode ficar limitada a esse tipo
+    csv = 'id,n\n' + ''.join(f"{i},{'' if i % 10 == 0 else i % 5}\n" for i in range(200))
+    dataset_id = upload(client, csv, 'nulos.csv')['dataset_id']
+
+    fraction = client.post('/replace_value', json={'dataset_id': dataset_id, 'column': 'n', 'oldValue': 2, 'newValue': 2.5})
+    assert fraction.status_code == 200, fraction.get_json()
+
+    pipeline = client.post('/pipeline', json={'dataset_id': dataset_id, 'steps': [
+        {'op': 'replace_value', 'column': 'n', 'oldValue': 1, 'newValue': 500}
+    ]})
+    assert pipeline.status_code == 200, pipeline.get_json()
+    profile = client.get(f'/datasets/{dataset_id}/profile?columns=n').get_json()['columns'][0]
+    assert profile['max'] == 500
+
+
+def test_pipeline_step_failure_returns_json_error(client, monkeypatch):
+    import transforms
+    dataset_id = upload(client, 'a\n1\n2\n', 'dados.csv')['dataset_id']
+
+    def fail(*args, **kwargs):
+        raise OverflowError("valor fora do intervalo")
+    monkeypatch.setattr(transforms, 'replace_values', fail)
+
+    response = client.post('/pipeline', json={'dataset_id': dataset_id, 'steps': [
+        {'op': 'replace_value', 'column': 'a', 'oldValue': 1, 'newValue': 2}
+    ]})
+    assert response.status_code == 500
+    assert response.get_json() == {"error": "valor fora do intervalo"}
+
+
+def test_update_computed_on_a_stale_version_is_refused(client, monkeypatch):
+    import transforms
+
+    dataset_id = upload(client, 'id,n\n1,10\n2,20\n', 'dados.csv')['dataset_id']
+    replace_values = transforms.replace_values
+
+    def concurrent_replace(df, column, mapping):
+        # Outra requisição sobre o mesmo dataset termina enquanto esta calcula
+        client.post('/rename_column', json={'dataset_id': dataset_id, 'currentColumn': 'id', 'newColumnName': 'codigo'})
+        return replace_values(df, column, mapping)
+
+    monkeypatch.setattr(transforms, 'replace_values', concurrent_replace)
+    response = client.post('/replace_value', json={'dataset_id': dataset_id, 'column': 'n', 'oldValue': 10, 'newValue': 11})
+    assert response.status_code == 409
+
+    history = client.get(f'/get_history?dataset_id={dataset_id}').get_json()
+    assert [item['operation'] for item in history][1:] == ["Renomeou coluna 'id' para 'codigo'"]
+    rows = client.get(f'/datasets/{dataset_id}/rows').get_json()
+    assert [row['n'] for row in rows['data']] == [10, 20]
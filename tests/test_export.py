@@ -0,0 +1,33 @@
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import export
+
+
+def read_parquet(df, chunksize):
+    return pq.read_table(io.BytesIO(b''.join(export.iter_parquet(df, chunksize=chunksize)))).to_pandas()
+
+
+def test_parquet_schema_comes_from_the_whole_frame():
+    df = pd.DataFrame({
+        'b': [1, 2, 'x', 'y'],
+        'nulos_no_inicio': [None, None, 'a', 'b'],
+        'n': [1.5, None, 3.0, 4.0],
+    })
+    result = read_parquet(df, chunksize=2)
+    assert result['b'].tolist() == ['1', '2', 'x', 'y']
+    assert result['nulos_no_inicio'].tolist()[2:] == ['a', 'b']
+    assert result['nulos_no_inicio'].isna().tolist()[:2] == [True, True]
+    assert result['n'].tolist()[2:] == [3.0, 4.0]
+
+
+def test_parquet_in_chunks_matches_single_chunk():
+    df = pd.DataFrame({'id': range(10), 'nome': [f"n{i}" for i in range(10)], 'valor': [i / 3 for i in range(10)]})
+    pd.testing.assert_frame_equal(read_parquet(df, chunksize=3), read_parquet(df, chunksize=100))
+
+
+def test_csv_in_chunks_matches_to_csv():
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', None, 'z']})
+    assert b''.join(export.iter_csv(df, chunksize=2)).decode('utf-8') == df.to_csv(index=False)
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from formula_engine import evaluate_formula
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'valor': [1.0, 2.0, 3.0], 'qtd': [10, 20, 30]})
+
+
+def test_formula_with_column_names(df):
+    result = evaluate_formula(df, '[valor] * qtd + 1')
+    assert result.tolist() == [11.0, 41.0, 91.0]
+
+
+def test_raw_placeholder_is_rejected(df):
+    with pytest.raises(ValueError, match="'__c3'"):
+        evaluate_formula(df, 'valor + __c3')
+
+
+def test_column_named_like_placeholder_is_allowed():
+    df = pd.DataFrame({'__c3': [1, 2]})
+    assert evaluate_formula(df, '[__c3] * 2').tolist() == [2.0, 4.0]
+
+
+def test_integer_power_does_not_wrap_around(df):
+    result = evaluate_formula(df, '10 ** 400 + valor')
+    assert result.isna().all()
+    assert evaluate_formula(df, '2 ** 62 + 0 * valor').iloc[0] == 2.0 ** 62
+
+
+def test_errors_use_column_names(df):
+    with pytest.raises(ValueError) as error:
+        evaluate_formula(df, 'valor if qtd else 0')
+    assert '__c' not in str(error.value)
+    assert '[valor]' in str(error.value)
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from dataset_store import DatasetStore, frame_nbytes
+from history import checkpoint_operation, column_operation, rename_operation
+
+
+def make_dataset():
+    store = DatasetStore(compact_dtypes=False)
+    df = pd.DataFrame({'a': range(1000), 'b': [f"x{i}" for i in range(1000)]})
+    return store, store.add('dono', df)
+
+
+def test_undo_and_redo_restore_each_state():
+    store, dataset = make_dataset()
+    original = dataset.df
+
+    renamed = dataset.df.rename(columns={'a': 'id'})
+    store.update(dataset.id, 'dono', renamed, rename_operation('a', 'id'))
+    doubled = renamed.assign(id=renamed['id'] * 2)
+    store.update(dataset.id, 'dono', doubled, column_operation("Dobrou id", 'id', renamed['id'], doubled['id']))
+    transposed = doubled.head(3).T
+    store.update(dataset.id, 'dono', transposed, checkpoint_operation("Transpôs", doubled, transposed))
+
+    pd.testing.assert_frame_equal(store.undo(dataset.id, 'dono').df, doubled)
+    pd.testing.assert_frame_equal(store.undo(dataset.id, 'dono').df, renamed)
+    pd.testing.assert_frame_equal(store.undo(dataset.id, 'dono').df, original)
+    pd.testing.assert_frame_equal(store.redo(dataset.id, 'dono').df, renamed)
+    pd.testing.assert_frame_equal(store.redo(dataset.id, 'dono').df, doubled)
+    assert [item['undone'] for item in dataset.history.to_list()] == [False, False, False, True]
+
+
+def test_history_does_not_count_the_current_table_twice():
+    store, dataset = make_dataset()
+    before = dataset.df
+    after = before.head(10).copy()
+
+    store.update(dataset.id, 'dono', after, checkpoint_operation("Filtrou", before, after, dataset.nbytes))
+    assert dataset.accounted_bytes == frame_nbytes(after) + frame_nbytes(before)
+    assert store.stats()['total_bytes'] == dataset.accounted_bytes
+
+    store.undo(dataset.id, 'dono')
+    assert dataset.nbytes == frame_nbytes(before)
+    assert dataset.accounted_bytes == frame_nbytes(before) + frame_nbytes(after)
+
+    # A nova operação descarta a desfeita; uma coluna criada só ocupa memória na tabela atual
+    column = dataset.df['a'] + 1
+    store.update(dataset.id, 'dono', dataset.df.assign(c=column), column_operation("Criou c", 'c', None, column))
+    assert dataset.accounted_bytes == frame_nbytes(dataset.df)
@@ -0,0 +1,50 @@
+import pandas as pd
+from openpyxl import Workbook
+
+import ingest
+
+
+def write_workbook(path, sheets):
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+
+
+def test_xlsx_duplicate_headers_are_renamed_like_read_excel(tmp_path, monkeypatch):
+    path = str(tmp_path / 'dados.xlsx')
+    rows = [['a', 'a', 'b', 'a'], [1, 2, 3, 4], [5, 6, 7, 8]]
+    write_workbook(path, {'P1': rows, 'P2': rows})
+    monkeypatch.setattr(ingest, '_excel_engine', lambda: None)
+
+    df = ingest.read_xlsx_sheet(path)
+    expected = pd.read_excel(path, engine='openpyxl')
+    assert list(df.columns) == list(expected.columns) == ['a', 'a.1', 'b', 'a.2']
+
+    both = ingest.read_xlsx_file(path, '*')
+    assert list(both.columns) == ['planilha', 'a', 'a.1', 'b', 'a.2']
+    assert len(both) == 4
+
+
+def test_csv_column_typed_differently_across_chunks_is_read_as_text(tmp_path):
+    path = tmp_path / 'dados.csv'
+    codes = [str(i % 7) for i in range(120)] + [f"A{i % 7}" for i in range(30)]
+    path.write_text('code,n\n' + ''.join(f"{code},{i}\n" for i, code in enumerate(codes)))
+
+    df = ingest._read_csv_chunks(str(path), chunksize=100)
+    assert df['code'].map(type).eq(str).all()
+    assert df['code'].drop_duplicates().size == 14
+    assert df['n'].dtype == 'int64'
+    pd.testing.assert_series_equal(df['code'], pd.read_csv(path, dtype={'code': 'str'})['code'])
+
+
+def test_csv_with_latin1_after_the_sample_is_read_again_instead_of_replaced(tmp_path):
+    path = tmp_path / 'dados.csv'
+    path.write_bytes(b'cidade,n\n' + b'Recife,1\n' * 10000 + 'São Paulo,2\n'.encode('latin-1'))
+
+    df = ingest.read_csv_file(str(path))
+    assert df['cidade'].iloc[-1] == 'São Paulo'
+    assert len(df) == 10001
@@ -0,0 +1,46 @@
+import time
+import tracemalloc
+
+import instrumentation
+
+
+def test_tracemalloc_stays_on_until_last_profiled_request_ends():
+    instrumentation._start_tracemalloc()
+    instrumentation._start_tracemalloc()
+    instrumentation._stop_tracemalloc()
+    assert tracemalloc.is_tracing()
+    instrumentation._stop_tracemalloc()
+    assert not tracemalloc.is_tracing()
+
+
+def test_rss_monitor_sees_memory_freed_before_the_end():
+    monitor = instrumentation.RssMonitor(interval=0.005)
+    measurement = monitor.begin()
+    block = b'x' * (64 * 1024 ** 2)
+    time.sleep(0.1)
+    del block
+    assert monitor.end(measurement) > 32 * 1024 ** 2
+
+
+def test_metrics_endpoint_reports_request_and_stage_series(client):
+    # As métricas da requisição são fechadas quando a resposta é fechada, como faz o servidor WSGI
+    client.post('/upload', data={}, content_type='multipart/form-data').close()
+    client.post('/undo', json={'dataset_id': 'inexistente'}).close()
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'gmaster_requests_total{method="POST",route="/upload",status="400"}' in text
+    assert 'gmaster_stage_seconds_count{route="/undo",stage="decode"}' in text
+
+
+def test_streamed_export_is_measured_when_the_body_ends(client):
+    from tests.test_datasets import upload
+
+    dataset = upload(client, 'a,b\n' + ''.join(f"{i},x{i}\n" for i in range(1000)), 'dados.csv')
+    response = client.get(f"/datasets/{dataset['dataset_id']}/export?format=csv")
+    body = response.get_data()
+    response.close()
+
+    text = client.get('/metrics').get_data(as_text=True)
+    route = '/datasets/<dataset_id>/export'
+    assert f'gmaster_response_bytes_total{{route="{route}"}} {len(body)}' in text
+    assert f'gmaster_stage_seconds_count{{route="{route}",stage="serialize"}} 1' in text
+    assert f'gmaster_request_rss_growth_bytes_max{{route="{route}"}}' in text
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from pipeline import optimize, run_pipeline, run_plan
+
+
+def frame():
+    return pd.DataFrame({
+        'a': [1, 2, 3, 4, 1],
+        'b': [10.0, 20.0, None, 40.0, 50.0],
+        'c': ['x', 'y', 'x', None, 'z'],
+    })
+
+
+def run_one_by_one(df, steps):
+    """Referência: cada etapa executada sozinha, sem unir etapas."""
+    for step in steps:
+        df = run_plan(df, optimize([step]))
+    return df
+
+
+def rename(current, new):
+    return {'op': 'rename_column', 'currentColumn': current, 'newColumnName': new}
+
+
+def replace(column, old, new):
+    return {'op': 'replace_value', 'column': column, 'oldValue': old, 'newValue': new}
+
+
+def formula(expression, name):
+    return {'op': 'calcular_nova_coluna', 'formula': expression, 'new_column': name}
+
+
+@pytest.mark.parametrize('steps', [
+    # Renomeações em cadeia e troca de nomes entre duas colunas
+    [rename('a', 'b2'), rename('b2', 'b3')],
+    [rename('a', 'tmp'), rename('b', 'a'), rename('tmp', 'b')],
+    [rename('a', 'd'), rename('c', 'e'), rename('d', 'f')],
+    # Substituições em cadeia, redirecionadas, revertidas e independentes
+    [replace('a', 1, 2), replace('a', 2, 3)],
+    [replace('a', 2, 1), replace('a', 1, 3)],
+    [replace('a', 1, 2), replace('a', 2, 1)],
+    [replace('a', 1, 2), replace('a', 1, 5)],
+    [replace('a', 1, 2), replace('a', 3, 1)],
+    [replace('a', 1, 9), replace('b', 10, 11), replace('a', 9, 4)],
+    # Colunas calculadas que usam colunas criadas antes
+    [formula('a * 2', 'dobro'), formula('dobro + b', 'soma')],
+    [rename('a', 'n'), formula('n + 1', 'n1'), replace('n1', 2, 0), {'op': 'clean_data'}],
+])
+def test_optimized_plan_matches_running_each_step(steps):
+    expected = run_one_by_one(frame(), steps)
+    result, plan = run_pipeline(frame(), steps)
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(plan) <= len(steps)
+
+
+def test_rename_of_a_column_already_renamed_fails_like_the_single_steps():
+    steps = [rename('a', 'b2'), rename('a', 'b3')]
+    with pytest.raises(ValueError):
+        run_one_by_one(frame(), steps)
+    with pytest.raises(ValueError):
+        run_pipeline(frame(), steps)
+
+
+def test_adjacent_steps_are_merged():
+    plan = optimize([rename('a', 'tmp'), rename('b', 'a'), rename('tmp', 'b'),
+                     replace('a', 1, 2), replace('a', 2, 3), formula('a + 1', 'x'), formula('x * 2', 'y')])
+    assert plan == [
+        {'op': 'rename', 'mapping': {'a': 'b', 'b': 'a'}},
+        {'op': 'replace', 'column': 'a', 'mapping': {1.0: 3.0, 2.0: 3.0}},
+        {'op': 'formulas', 'formulas': [('x', 'a + 1'), ('y', 'x * 2')]},
+    ]
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine
+
+from query_builder import build_query
+
+
+@pytest.fixture
+def table():
+    engine = create_engine('sqlite://')
+    metadata = MetaData()
+    table = Table('clientes', metadata, Column('id', Integer), Column('nome', String))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': 1, 'nome': 'Ana'}, {'id': 2, 'nome': 'Bia'}])
+    table.engine = engine
+    return table
+
+
+def test_structured_query(table):
+    stmt = build_query(table, columns=['nome'], filters=[{'column': 'id', 'op': 'gt', 'value': 1}],
+                       sort=[{'column': 'nome', 'direction': 'desc'}], limit='10')
+    with table.engine.connect() as conn:
+        assert conn.execute(stmt).all() == [('Bia',)]
+
+
+@pytest.mark.parametrize('query', [
+    {'filters': 'id > 1'},
+    {'filters': [{'column': 'id', 'value': {'$gt': 1}}]},
+    {'filters': [{'column': 'id', 'op': 'in', 'value': [1, {'a': 2}]}]},
+    {'filters': [{'column': {'nome': 1}, 'op': 'eq', 'value': 1}]},
+    {'columns': 'nome'},
+    {'columns': [['nome']]},
+    {'sort': ['nome']},
+    {'aggregations': [{'func': 'count', 'column': '*', 'alias': ['x']}]},
+    {'limit': {'n': 1}},
+    {'offset': 'dez'},
+])
+def test_malformed_query_is_rejected_with_value_error(table, query):
+    with pytest.raises(ValueError):
+        build_query(table, **query)
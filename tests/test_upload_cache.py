@@ -0,0 +1,18 @@
+import pandas as pd
+
+from ingest import read_upload_file
+from upload_cache import UploadCache
+
+
+def test_cache_hit_returns_same_frame_as_miss(tmp_path):
+    path = tmp_path / 'dados.txt'
+    path.write_text(''.join(f"|{i}|{i * 0.5}|texto {i}|\n" for i in range(50)), encoding='utf-8')
+    cache = UploadCache(str(tmp_path / 'cache'))
+
+    miss = read_upload_file(str(path), 'dados.txt')
+    assert cache.get('digest') is None
+    cache.put('digest', miss)
+    hit = cache.get('digest')
+
+    assert list(hit.columns) == list(miss.columns) == [1, 2, 3]
+    pd.testing.assert_frame_equal(hit, miss)
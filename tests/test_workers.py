@@ -0,0 +1,22 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import workers
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    workers.shutdown()
+    monkeypatch.setattr(workers, 'WORKER_PROCESSES', 1)
+    yield
+    workers.shutdown()
+
+
+def test_pool_is_recreated_after_a_worker_dies(pool):
+    # Simula um processo morto no meio da tarefa (ex.: falta de memória)
+    with pytest.raises(BrokenProcessPool):
+        workers.submit(os._exit, 1).result(timeout=30)
+
+    assert workers.submit(abs, -3).result(timeout=30) == 3
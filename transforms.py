@@ -0,0 +1,42 @@
+import pandas as pd
+
+from formula_engine import evaluate_formula
+
+
+def rename_columns(df: pd.DataFrame, mapping: dict) -> pd.DataFrame:
+    """Renomeia colunas ({nome atual: novo nome}), validando ausências e conflitos."""
+    for current, new in mapping.items():
+        if current not in df.columns:
+            raise ValueError(f"A coluna '{current}' não existe.")
+    remaining = [col for col in df.columns if col not in mapping]
+    targets = list(mapping.values()) + remaining
+    if len(set(targets)) != len(targets):
+        duplicated = next(name for name in targets if targets.count(name) > 1)
+        raise ValueError(f"A coluna '{duplicated}' já existe.")
+    return df.rename(columns=mapping)
+
+
+def replace_values(df: pd.DataFrame, column, mapping: dict) -> pd.DataFrame:
+    """
+    Converte a coluna para número e substitui os valores ({antigo: novo}) em uma
+    única passada. Valores não numéricos viram nulos, como na substituição original.
+    """
+    if column not in df.columns:
+        raise ValueError(f"A coluna '{column}' não existe.")
+    mapping = {float(old): float(new) for old, new in mapping.items()}
+    updated = df.copy(deep=False)
+    # Em float64: tipos reduzidos na compactação (Int8, float32) não aceitariam qualquer valor novo
+    updated[column] = pd.to_numeric(df[column], errors='coerce').astype('float64').replace(mapping)
+    return updated
+
+
+def add_formula_columns(df: pd.DataFrame, formulas) -> pd.DataFrame:
+    """
+    Cria colunas calculadas a partir de uma lista de (nome, fórmula). As fórmulas
+    são avaliadas em sequência sobre o mesmo DataFrame, então uma pode usar a
+    coluna criada pela anterior sem materializar tabelas intermediárias.
+    """
+    updated = df.copy(deep=False)
+    for name, formula in formulas:
+        updated[name] = evaluate_formula(updated, formula)
+    return updated
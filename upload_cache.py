@@ -0,0 +1,168 @@
+import logging
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Sem o pyarrow o cache fica desativado
+    pa = None
+    feather = None
+
+# Incrementar quando a leitura dos arquivos mudar, invalidando as entradas já gravadas
+CACHE_VERSION = b'gmaster-upload-cache-3'
+# Chave dos metadados do Arrow com os rótulos originais das colunas (o Arrow só guarda texto)
+COLUMNS_METADATA_KEY = b'gmaster_columns'
+
+logger = logging.getLogger(__name__)
+
+
+def new_upload_hasher(extension: str, options=None):
+    """
+    Hasher usado para a impressão digital do upload. A extensão e as opções de
+    leitura (planilhas selecionadas) entram no hash, pois o mesmo conteúdo
+    gera tabelas diferentes como .txt ou .csv, ou com outras planilhas.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(CACHE_VERSION)
+    hasher.update((extension or '').encode('utf-8'))
+    if options:
+        hasher.update(repr(options).encode('utf-8'))
+    return hasher
+
+
+class UploadCache:
+    """
+    Cache em disco dos DataFrames lidos de uploads, indexado pelo hash do
+    conteúdo. As entradas são gravadas em Feather sem compressão, para que a
+    releitura use mapeamento de memória em vez de reprocessar o arquivo.
+
+    Quando o total em disco passa de `max_bytes`, as entradas menos usadas são
+    removidas (LRU pela data de modificação, atualizada a cada acerto).
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = feather is not None and max_bytes > 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            self._load_index()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.feather")
+
+    def _load_index(self):
+        """Reconstrói o índice a partir dos arquivos já gravados, do menos ao mais recente."""
+        if not os.path.isdir(self.directory):
+            return
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.feather'):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-len('.feather')], stat.st_size))
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self._total_bytes += size
+
+    def get(self, digest: str):
+        """Retorna o DataFrame em cache ou None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if digest not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+        path = self._path(digest)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            df = table.to_pandas(split_blocks=True)
+            labels = (table.schema.metadata or {}).get(COLUMNS_METADATA_KEY)
+            if labels is not None:
+                df.columns = json.loads(labels)
+            os.utime(path)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning("Entrada do cache de uploads inválida (%s): %s", digest, e)
+            self._discard(digest)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        logger.info("Upload encontrado no cache (%s).", digest)
+        return df
+
+    def put(self, digest: str, df: pd.DataFrame):
+        """
+        Grava o DataFrame no cache. Tabelas que o Arrow não representa (tipos
+        misturados) ou com rótulos de coluna que não voltam iguais do JSON são ignoradas.
+        """
+        if not self.enabled:
+            return
+        labels = list(df.columns)
+        try:
+            encoded = json.dumps(labels)
+        except TypeError:
+            encoded = None
+        if encoded is None or json.loads(encoded) != labels:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                   COLUMNS_METADATA_KEY: encoded.encode('utf-8')})
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes:
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, self._path(digest))
+        except (OSError, pa.ArrowException, ValueError) as e:
+            logger.warning("Upload não armazenado no cache: %s", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(digest, 0)
+            self._entries[digest] = size
+            self._evict()
+
+    def _discard(self, digest: str):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(digest, 0)
+        if os.path.exists(self._path(digest)):
+            os.remove(self._path(digest))
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            digest, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+            logger.info("Upload removido do cache (%s).", digest)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
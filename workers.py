@@ -0,0 +1,57 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Processos compartilhados pela leitura de ZIPs, planilhas de XLSX e jobs de upload
+WORKER_PROCESSES = int(os.getenv('GMASTER_WORKER_PROCESSES', str(os.cpu_count() or 1)))
+# 'fork' dentro de um servidor com várias threads pode copiar locks travados e deixar o processo filho preso
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Pool de processos único da aplicação, criado no primeiro uso. Se um
+    processo morreu (ex.: falta de memória lendo um XLSX grande), o
+    ProcessPoolExecutor fica inutilizável e é substituído por um novo.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool._broken:
+            logger.warning("Pool de processos inutilizável (%s); criando um novo.", _pool._broken)
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == 'forkserver':
+                # Os processos já nascem com pandas e os leitores importados
+                context.set_forkserver_preload(['ingest'])
+            _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES, mp_context=context)
+        return _pool
+
+
+def submit(func, *args):
+    """
+    Envia `func(*args)` ao pool compartilhado. Se o pool quebrou entre a
+    obtenção e o envio, a tarefa vai para o pool recriado; apenas as tarefas
+    em execução no processo que morreu falham.
+    """
+    try:
+        return get_process_pool().submit(func, *args)
+    except BrokenProcessPool:
+        return get_process_pool().submit(func, *args)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None